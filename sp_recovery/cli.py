@@ -9,24 +9,26 @@ from typing import Sequence
 from sp_recovery.config import (
     DEFAULT_DOMAIN,
     DEFAULT_FROM_DATE,
+    DEFAULT_MAX_CONCURRENCY,
     DEFAULT_MODERN_CUTOFF_DATE,
+    DEFAULT_REWRITE_WORKERS,
     DEFAULT_TO_DATE,
     RecoveryConfig,
     default_equivalent_hosts,
     load_missing_urls_from_gap_csv,
     normalize_equivalent_hosts,
 )
-from sp_recovery.discovery import capture_from_dict, capture_to_dict
-from sp_recovery.io_utils import append_jsonl, read_jsonl, write_jsonl
+from sp_recovery.discovery import capture_from_dict, write_captures_jsonl
+from sp_recovery.io_utils import iter_jsonl, jsonl_appender
 from sp_recovery.pipeline import (
     discover_phase,
+    only_missing_predicate,
     recover_phase,
     run_pipeline,
     run_report_only,
 )
-from sp_recovery.recover import ProvenanceRecord
+from sp_recovery.recover import provenance_to_jsonl_line
 from sp_recovery.rewrite import rewrite_recovered_html_files
-from sp_recovery.url_utils import canonical_identity_key
 
 
 def _add_common_args(parser: argparse.ArgumentParser) -> None:
@@ -41,6 +43,18 @@ def _add_common_args(parser: argparse.ArgumentParser) -> None:
     parser.add_argument("--output-root", default="output/mirror")
     parser.add_argument("--max-canonical", type=int, default=0)
     parser.add_argument("--request-interval-seconds", type=float, default=2.0)
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="Recovery fetches allowed in flight at once; starts stay paced by the request interval.",
+    )
+    parser.add_argument(
+        "--rewrite-workers",
+        type=int,
+        default=DEFAULT_REWRITE_WORKERS,
+        help="Worker processes used to rewrite recovered HTML pages for local browsing.",
+    )
     parser.add_argument(
         "--canonical-host",
         default=None,
@@ -75,6 +89,8 @@ def _config_from_args(args: argparse.Namespace) -> RecoveryConfig:
         output_root=Path(args.output_root),
         max_canonical=max(args.max_canonical, 0),
         request_interval_seconds=max(args.request_interval_seconds, 0.0),
+        max_concurrency=max(args.max_concurrency, 1),
+        rewrite_workers=max(args.rewrite_workers, 1),
         only_missing_urls=load_missing_urls_from_gap_csv(args.only_missing_from),
         canonical_host=canonical_host,
         equivalent_hosts=equivalent_hosts,
@@ -86,8 +102,8 @@ def _discover_command(args: argparse.Namespace) -> int:
     discovered, canonical = discover_phase(config)
 
     state_dir = config.output_root / "state"
-    write_jsonl(state_dir / "discovered_captures.jsonl", [capture_to_dict(row) for row in discovered])
-    write_jsonl(state_dir / "canonical_urls.jsonl", [capture_to_dict(row) for row in canonical])
+    write_captures_jsonl(state_dir / "discovered_captures.jsonl", discovered)
+    write_captures_jsonl(state_dir / "canonical_urls.jsonl", canonical)
 
     print(f"Discovered captures: {len(discovered)}")
     print(f"Canonical URLs: {len(canonical)}")
@@ -98,35 +114,20 @@ def _recover_command(args: argparse.Namespace) -> int:
     config = _config_from_args(args)
     state_dir = config.output_root / "state"
 
-    canonical_rows = read_jsonl(state_dir / "canonical_urls.jsonl")
-    canonical_records = [capture_from_dict(row) for row in canonical_rows]
-    if config.only_missing_urls:
-        missing_keys = {
-            canonical_identity_key(
-                url,
-                canonical_host=config.canonical_host,
-                equivalent_hosts=config.equivalent_hosts,
-            )
-            for url in config.only_missing_urls
-        }
-        canonical_records = [
-            row
-            for row in canonical_records
-            if canonical_identity_key(
-                row.original,
-                canonical_host=config.canonical_host,
-                equivalent_hosts=config.equivalent_hosts,
-            )
-            in missing_keys
-        ]
+    is_missing = only_missing_predicate(config)
+    canonical_records = [
+        capture_from_dict(row)
+        for row in iter_jsonl(state_dir / "canonical_urls.jsonl")
+        if is_missing is None or is_missing(str(row["original"]))
+    ]
 
     provenance_file = state_dir / "provenance.jsonl"
-    write_jsonl(provenance_file, [])
-
-    def _append_provenance(record: ProvenanceRecord) -> None:
-        append_jsonl(provenance_file, record.as_dict())
-
-    recovered = recover_phase(config, canonical_records, on_record=_append_provenance)
+    with jsonl_appender(
+        provenance_file,
+        truncate=True,
+        serialize=provenance_to_jsonl_line,
+    ) as append_provenance:
+        recovered = recover_phase(config, canonical_records, on_record=append_provenance)
 
     rewrite_recovered_html_files(
         config.output_root,
@@ -134,6 +135,7 @@ def _recover_command(args: argparse.Namespace) -> int:
         unresolved_csv_path=state_dir / "unresolved_links.csv",
         canonical_host=config.canonical_host,
         equivalent_hosts=config.equivalent_hosts,
+        workers=config.rewrite_workers,
     )
 
     print(f"Recovered artifacts: {len(recovered)}")
@@ -157,25 +159,24 @@ def _run_command(args: argparse.Namespace) -> int:
     return 0
 
 
+_COMMAND_HANDLERS = {
+    "discover": _discover_command,
+    "recover": _recover_command,
+    "report": _report_command,
+    "run": _run_command,
+}
+
+
 def _add_subcommands(parser: argparse.ArgumentParser) -> None:
     subparsers = parser.add_subparsers(dest="command")
     subparsers.required = True
 
-    discover = subparsers.add_parser("discover")
-    _add_common_args(discover)
-    discover.set_defaults(handler=_discover_command)
-
-    recover = subparsers.add_parser("recover")
-    _add_common_args(recover)
-    recover.set_defaults(handler=_recover_command)
-
-    report = subparsers.add_parser("report")
-    _add_common_args(report)
-    report.set_defaults(handler=_report_command)
+    common = argparse.ArgumentParser(add_help=False)
+    _add_common_args(common)
 
-    run = subparsers.add_parser("run")
-    _add_common_args(run)
-    run.set_defaults(handler=_run_command)
+    for name, handler in _COMMAND_HANDLERS.items():
+        subparser = subparsers.add_parser(name, parents=[common])
+        subparser.set_defaults(handler=handler)
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import csv
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Iterable
@@ -18,6 +18,8 @@ DEFAULT_DOMAIN = "somethingpositive.net"
 DEFAULT_FROM_DATE = "2001-01-01"
 DEFAULT_TO_DATE = "2019-12-31"
 DEFAULT_MODERN_CUTOFF_DATE = "2020-01-01"
+DEFAULT_MAX_CONCURRENCY = 1
+DEFAULT_REWRITE_WORKERS = 1
 
 
 def default_equivalent_hosts(canonical_host: str) -> frozenset[str]:
@@ -51,6 +53,11 @@ class RecoveryConfig:
     modern_cutoff_date: str = DEFAULT_MODERN_CUTOFF_DATE
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST
     equivalent_hosts: frozenset[str] = DEFAULT_EQUIVALENT_SITE_HOSTS
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    rewrite_workers: int = DEFAULT_REWRITE_WORKERS
+    _from_timestamp: str = field(init=False, repr=False, compare=False)
+    _to_timestamp: str = field(init=False, repr=False, compare=False)
+    _effective_to_timestamp: str = field(init=False, repr=False, compare=False)
 
     def __post_init__(self) -> None:
         canonical_host = normalize_site_host(self.canonical_host or self.domain)
@@ -61,23 +68,26 @@ class RecoveryConfig:
         object.__setattr__(self, "canonical_host", canonical_host)
         object.__setattr__(self, "equivalent_hosts", frozenset(equivalents))
 
+        from_date = datetime.strptime(self.from_date, "%Y-%m-%d")
+        to_date = datetime.strptime(self.to_date, "%Y-%m-%d")
+        cutoff_start = datetime.strptime(self.modern_cutoff_date, "%Y-%m-%d")
+        cutoff_last_allowed = cutoff_start - timedelta(days=1)
+        effective = min(to_date, cutoff_last_allowed)
+        object.__setattr__(self, "_from_timestamp", from_date.strftime("%Y%m%d000000"))
+        object.__setattr__(self, "_to_timestamp", to_date.strftime("%Y%m%d235959"))
+        object.__setattr__(self, "_effective_to_timestamp", effective.strftime("%Y%m%d235959"))
+
     @property
     def from_timestamp(self) -> str:
-        parsed = datetime.strptime(self.from_date, "%Y-%m-%d")
-        return parsed.strftime("%Y%m%d000000")
+        return self._from_timestamp
 
     @property
     def to_timestamp(self) -> str:
-        parsed = datetime.strptime(self.to_date, "%Y-%m-%d")
-        return parsed.strftime("%Y%m%d235959")
+        return self._to_timestamp
 
     @property
     def effective_to_timestamp(self) -> str:
-        to_date = datetime.strptime(self.to_date, "%Y-%m-%d")
-        cutoff_start = datetime.strptime(self.modern_cutoff_date, "%Y-%m-%d")
-        cutoff_last_allowed = cutoff_start - timedelta(days=1)
-        effective = min(to_date, cutoff_last_allowed)
-        return effective.strftime("%Y%m%d235959")
+        return self._effective_to_timestamp
 
 
 def load_missing_urls_from_gap_csv(path: Path | None) -> set[str]:
@@ -87,9 +97,13 @@ def load_missing_urls_from_gap_csv(path: Path | None) -> set[str]:
         return set()
 
     with path.open("r", encoding="utf-8", newline="") as handle:
-        reader = csv.DictReader(handle)
+        reader = csv.reader(handle)
+        header = next(reader, None)
+        if header is None or "original_url" not in header:
+            return set()
+        column = header.index("original_url")
         return {
-            row.get("original_url", "").strip()
+            url
             for row in reader
-            if row.get("original_url", "").strip()
+            if len(row) > column and (url := row[column].strip())
         }
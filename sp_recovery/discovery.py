@@ -3,12 +3,17 @@
 from __future__ import annotations
 
 import json
+import sys
+from bisect import bisect_left
 from dataclasses import dataclass
+from json.encoder import encode_basestring_ascii
+from pathlib import Path
 from typing import Any, Callable, Iterable, Sequence
 from urllib.error import HTTPError, URLError
 from urllib.parse import urlencode
 from urllib.request import Request, urlopen
 
+from sp_recovery.io_utils import write_jsonl_lines
 from sp_recovery.url_utils import (
     DEFAULT_CANONICAL_SITE_HOST,
     DEFAULT_EQUIVALENT_SITE_HOSTS,
@@ -52,23 +57,41 @@ def parse_cdx_rows(rows: Sequence[Sequence[str]]) -> list[CaptureRecord]:
         field_names = DEFAULT_FIELDS
         data_rows = rows
 
+    column_index = {name: index for index, name in enumerate(field_names)}
+    timestamp_index = column_index.get("timestamp")
+    original_index = column_index.get("original")
+    mimetype_index = column_index.get("mimetype")
+    statuscode_index = column_index.get("statuscode")
+    digest_index = column_index.get("digest")
+    if timestamp_index is None or original_index is None:
+        return []
+
+    # The layout we request from CDX can be indexed positionally without lookups.
+    default_layout = tuple(field_names) == DEFAULT_FIELDS
+    default_width = len(DEFAULT_FIELDS)
+
     parsed: list[CaptureRecord] = []
     for row in data_rows:
-        row_map = {
-            field_names[index]: value
-            for index, value in enumerate(row)
-            if index < len(field_names)
-        }
-        if "timestamp" not in row_map or "original" not in row_map:
+        if default_layout and len(row) >= default_width:
+            parsed.append(
+                CaptureRecord(row[0], row[1], sys.intern(row[2]), int(row[3] or 0), row[4])
+            )
+            continue
+
+        width = min(len(row), len(field_names))
+        if timestamp_index >= width or original_index >= width:
             continue
 
+        has_mimetype = mimetype_index is not None and mimetype_index < width
+        has_statuscode = statuscode_index is not None and statuscode_index < width
+        has_digest = digest_index is not None and digest_index < width
         parsed.append(
             CaptureRecord(
-                timestamp=row_map["timestamp"],
-                original=row_map["original"],
-                mimetype=row_map.get("mimetype", "application/octet-stream"),
-                statuscode=int(row_map.get("statuscode", "0") or 0),
-                digest=row_map.get("digest"),
+                timestamp=row[timestamp_index],
+                original=row[original_index],
+                mimetype=sys.intern(row[mimetype_index]) if has_mimetype else "application/octet-stream",
+                statuscode=int((row[statuscode_index] if has_statuscode else "0") or 0),
+                digest=row[digest_index] if has_digest else None,
             )
         )
 
@@ -110,12 +133,63 @@ def _window_rank(timestamp: str, preferred_windows: Sequence[tuple[str, str]]) -
     return len(preferred_windows)
 
 
+# Bisect equivalent of _window_rank. Windows may overlap, so the rank of every
+# boundary point and of every interval between neighbouring boundaries is
+# precomputed.
+@dataclass(frozen=True, slots=True)
+class _WindowRanker:
+    boundaries: tuple[str, ...]
+    boundary_ranks: tuple[int, ...]
+    interval_ranks: tuple[int, ...]
+
+    def rank(self, timestamp: str) -> int:
+        index = bisect_left(self.boundaries, timestamp)
+        if index < len(self.boundaries) and self.boundaries[index] == timestamp:
+            return self.boundary_ranks[index]
+        return self.interval_ranks[index]
+
+
+def _build_window_ranker(preferred_windows: Sequence[tuple[str, str]]) -> _WindowRanker:
+    boundaries = tuple(sorted({bound for window in preferred_windows for bound in window}))
+    unmatched = len(preferred_windows)
+    interval_ranks = [unmatched]
+    for lower, upper in zip(boundaries, boundaries[1:]):
+        rank = next(
+            (
+                index
+                for index, (start, end) in enumerate(preferred_windows)
+                if start <= lower and upper <= end
+            ),
+            unmatched,
+        )
+        interval_ranks.append(rank)
+    interval_ranks.append(unmatched)
+
+    return _WindowRanker(
+        boundaries=boundaries,
+        boundary_ranks=tuple(_window_rank(bound, preferred_windows) for bound in boundaries),
+        interval_ranks=tuple(interval_ranks),
+    )
+
+
 def _mimetype_rank(mimetype: str) -> int:
     if mimetype == "text/html" or mimetype.startswith("image/"):
         return 0
     return 1
 
 
+def _capture_preference(
+    record: CaptureRecord,
+    window_ranker: _WindowRanker,
+) -> tuple[int, int, int, str]:
+    status_rank = 0 if record.statuscode == 200 else 1
+    mime_rank = _mimetype_rank(record.mimetype)
+    window_rank = window_ranker.rank(record.timestamp)
+    # Higher is better. CDX timestamps are fixed-width digit strings, so the
+    # raw string orders newer captures last without an int() conversion.
+    return (-status_rank, -mime_rank, -window_rank, record.timestamp)
+
+
 def choose_canonical_capture(
     captures: Sequence[CaptureRecord],
     *,
@@ -124,15 +198,8 @@ def choose_canonical_capture(
     if not captures:
         return None
 
-    def rank(record: CaptureRecord) -> tuple[int, int, int, int]:
-        status_rank = 0 if record.statuscode == 200 else 1
-        mime_rank = _mimetype_rank(record.mimetype)
-        window_rank = _window_rank(record.timestamp, preferred_windows)
-        # Prefer newer captures within the same quality/window bucket.
-        recency_rank = -int(record.timestamp)
-        return (status_rank, mime_rank, window_rank, recency_rank)
-
-    return min(captures, key=rank)
+    window_ranker = _build_window_ranker(preferred_windows)
+    return max(captures, key=lambda record: _capture_preference(record, window_ranker))
 
 
 def canonicalize_by_original_url(
@@ -142,24 +209,20 @@ def canonicalize_by_original_url(
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
     equivalent_hosts: Sequence[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
 ) -> dict[str, CaptureRecord]:
-    grouped: dict[str, list[CaptureRecord]] = {}
+    window_ranker = _build_window_ranker(preferred_windows)
+    best: dict[str, tuple[tuple[int, int, int, str], CaptureRecord]] = {}
     for capture in captures:
-        grouped.setdefault(
-            canonical_identity_key(
-                capture.original,
-                canonical_host=canonical_host,
-                equivalent_hosts=equivalent_hosts,
-            ),
-            [],
-        ).append(capture)
-
-    canonical: dict[str, CaptureRecord] = {}
-    for identity_key, options in grouped.items():
-        selected = choose_canonical_capture(options, preferred_windows=preferred_windows)
-        if selected is not None:
-            canonical[identity_key] = selected
+        identity_key = canonical_identity_key(
+            capture.original,
+            canonical_host=canonical_host,
+            equivalent_hosts=equivalent_hosts,
+        )
+        preference = _capture_preference(capture, window_ranker)
+        current = best.get(identity_key)
+        if current is None or preference > current[0]:
+            best[identity_key] = (preference, capture)
 
-    return canonical
+    return {identity_key: capture for identity_key, (_, capture) in best.items()}
 
 
 def capture_to_dict(capture: CaptureRecord) -> dict[str, Any]:
@@ -172,11 +235,26 @@ def capture_to_dict(capture: CaptureRecord) -> dict[str, Any]:
     }
 
 
+# Byte-identical to json.dumps(capture_to_dict(capture), sort_keys=True).
+def capture_to_jsonl_line(capture: CaptureRecord) -> str:
+    return (
+        f'{{"digest": {encode_basestring_ascii(capture.digest or "")}, '
+        f'"mimetype": {encode_basestring_ascii(capture.mimetype)}, '
+        f'"original": {encode_basestring_ascii(capture.original)}, '
+        f'"statuscode": {int(capture.statuscode)}, '
+        f'"timestamp": {encode_basestring_ascii(capture.timestamp)}}}\n'
+    )
+
+
+def write_captures_jsonl(path: Path, captures: Iterable[CaptureRecord]) -> None:
+    write_jsonl_lines(path, map(capture_to_jsonl_line, captures))
+
+
 def capture_from_dict(payload: dict[str, Any]) -> CaptureRecord:
     return CaptureRecord(
         timestamp=str(payload["timestamp"]),
         original=str(payload["original"]),
-        mimetype=str(payload.get("mimetype", "application/octet-stream")),
+        mimetype=sys.intern(str(payload.get("mimetype", "application/octet-stream"))),
         statuscode=int(payload.get("statuscode", 0)),
         digest=str(payload.get("digest") or "") or None,
     )
@@ -185,7 +263,7 @@ def capture_from_dict(payload: dict[str, Any]) -> CaptureRecord:
 def _fetch_cdx_rows(url: str) -> list[object]:
     request = Request(url, headers={"User-Agent": "sp-recovery/0.1 (+archive-friendly)"})
     with urlopen(request, timeout=60) as response:
-        payload = response.read().decode("utf-8")
+        payload = response.read()
     parsed = json.loads(payload)
     if not isinstance(parsed, list):
         return []
@@ -0,0 +1,73 @@
+"""Persistent sha256 cache for recovered artifacts keyed by file metadata."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from types import TracebackType
+
+from sp_recovery.io_utils import ensure_parent_dir, sha256_file
+
+_COMMIT_EVERY = 500
+
+
+# Entries are keyed by mirror-relative path and reused only while the file's
+# size and mtime still match.
+class HashCache:
+    def __init__(self, path: Path) -> None:
+        ensure_parent_dir(path)
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def __enter__(self) -> HashCache:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def sha256_for(self, file_path: Path, key: str, *, stat: os.stat_result | None = None) -> str:
+        if stat is None:
+            stat = file_path.stat()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, sha256 FROM hashes WHERE path = ?",
+                (key,),
+            ).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = sha256_file(file_path)
+        self._store(key, stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def record(self, file_path: Path, key: str, sha256: str) -> None:
+        stat = file_path.stat()
+        self._store(key, stat.st_size, stat.st_mtime_ns, sha256)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def _store(self, key: str, size: int, mtime_ns: int, sha256: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (key, size, mtime_ns, sha256),
+            )
+            self._pending += 1
+            if self._pending >= _COMMIT_EVERY:
+                self._connection.commit()
+                self._pending = 0
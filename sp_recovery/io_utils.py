@@ -5,56 +5,115 @@ from __future__ import annotations
 import hashlib
 import json
 import os
+from contextlib import contextmanager
 from pathlib import Path
 import tempfile
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Iterator
+
+_JSONL_BUFFER_SIZE = 1 << 20
+_HASH_CHUNK_SIZE = 1 << 20
+_JSONL_ENCODER = json.JSONEncoder(sort_keys=True)
+
+
+# Directories write_bytes has created during the current recover_captures call.
+_CREATED_DIRS: set[Path] = set()
 
 
 def ensure_parent_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
-def write_bytes(path: Path, payload: bytes) -> None:
-    ensure_parent_dir(path)
-    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+def forget_created_dirs() -> None:
+    _CREATED_DIRS.clear()
+
+
+# durable=False skips the fsync; the replace stays atomic, so interrupted runs
+# never leave partial files, but data may not survive a power loss.
+def write_bytes(path: Path, payload: bytes, *, durable: bool = True) -> None:
+    directory = path.parent
+    if directory not in _CREATED_DIRS:
+        directory.mkdir(parents=True, exist_ok=True)
+        _CREATED_DIRS.add(directory)
+    try:
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(directory))
+    except FileNotFoundError:
+        # The directory was removed after it was first created.
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(directory))
     tmp_path = Path(tmp_name)
     try:
         with os.fdopen(fd, "wb") as handle:
             handle.write(payload)
-            handle.flush()
-            os.fsync(handle.fileno())
+            if durable:
+                handle.flush()
+                os.fsync(handle.fileno())
         os.replace(tmp_path, path)
-    finally:
-        if tmp_path.exists():
-            tmp_path.unlink()
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
 
 def sha256_hex(payload: bytes) -> str:
-    return hashlib.sha256(payload).hexdigest()
+    # Content fingerprint for provenance, not a security boundary.
+    return hashlib.sha256(payload, usedforsecurity=False).hexdigest()
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256(usedforsecurity=False)
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _jsonl_line(row: dict[str, Any]) -> str:
+    return _JSONL_ENCODER.encode(row) + "\n"
 
 
 def append_jsonl(path: Path, row: dict[str, Any]) -> None:
     ensure_parent_dir(path)
     with path.open("a", encoding="utf-8") as handle:
-        handle.write(json.dumps(row, sort_keys=True) + "\n")
+        handle.write(_jsonl_line(row))
 
 
-def write_jsonl(path: Path, rows: Iterable[dict[str, Any]]) -> None:
+# Keeps the file open for the whole run and flushes every row, so readers and
+# interrupted runs see each completed record.
+@contextmanager
+def jsonl_appender(
+    path: Path,
+    *,
+    truncate: bool = False,
+    serialize: Callable[[Any], str] = _jsonl_line,
+) -> Iterator[Callable[[Any], None]]:
     ensure_parent_dir(path)
-    with path.open("w", encoding="utf-8") as handle:
-        for row in rows:
-            handle.write(json.dumps(row, sort_keys=True) + "\n")
+    with path.open("w" if truncate else "a", encoding="utf-8") as handle:
 
+        def append(row: Any) -> None:
+            handle.write(serialize(row))
+            handle.flush()
 
-def read_jsonl(path: Path) -> list[dict[str, Any]]:
+        yield append
+
+
+def write_jsonl_lines(path: Path, lines: Iterable[str]) -> None:
+    ensure_parent_dir(path)
+    with path.open("w", encoding="utf-8", buffering=_JSONL_BUFFER_SIZE) as handle:
+        handle.writelines(lines)
+
+
+def write_jsonl(path: Path, rows: Iterable[dict[str, Any]]) -> None:
+    write_jsonl_lines(path, map(_jsonl_line, rows))
+
+
+def iter_jsonl(path: Path) -> Iterator[dict[str, Any]]:
     if not path.exists():
-        return []
+        return
 
-    parsed: list[dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as handle:
+    with path.open("rb") as handle:
         for line in handle:
-            line = line.strip()
-            if not line:
-                continue
-            parsed.append(json.loads(line))
-    return parsed
+            if not line.isspace():
+                yield json.loads(line)
+
+
+def read_jsonl(path: Path) -> list[dict[str, Any]]:
+    return list(iter_jsonl(path))
@@ -3,30 +3,45 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import lru_cache
+import heapq
 from pathlib import Path
 import re
+import sys
 from collections.abc import Collection
-from typing import Sequence
-from urllib.parse import urlparse
+from typing import Callable, Iterable, Sequence
 
 from sp_recovery.config import RecoveryConfig
 from sp_recovery.discovery import (
     CaptureRecord,
     canonicalize_by_original_url,
-    capture_to_dict,
     fetch_cdx_records,
+    write_captures_jsonl,
 )
-from sp_recovery.io_utils import append_jsonl, read_jsonl, write_jsonl
+from sp_recovery.hash_cache import HashCache
+from sp_recovery.io_utils import iter_jsonl, jsonl_appender
 from sp_recovery.recover import (
+    RECOVERED_STATUSES,
     Fetcher,
     ProvenanceCallback,
     ProvenanceRecord,
     local_relpath_from_original,
+    provenance_to_jsonl_line,
     recover_captures,
 )
-from sp_recovery.reporting import build_gap_register, compute_coverage, write_reports
-from sp_recovery.rewrite import extract_internal_asset_urls, rewrite_recovered_html_files
-from sp_recovery.url_utils import canonical_identity_key
+from sp_recovery.reporting import (
+    build_gap_register,
+    compute_coverage,
+    index_provenance_rows,
+    provenance_row,
+    write_reports,
+)
+from sp_recovery.rewrite import (
+    extract_internal_asset_urls,
+    recovered_html_pages,
+    rewrite_recovered_html_files,
+)
+from sp_recovery.url_utils import canonical_identity_key, parse_url
 
 
 @dataclass(frozen=True, slots=True)
@@ -36,78 +51,99 @@ class PipelineRunResult:
     recovered_count: int
 
 
-_STRIP_PAGE_RE = re.compile(r"^/sp(?P<month>\d{2})(?P<day>\d{2})(?P<year>\d{4})\.html$", re.IGNORECASE)
-_STRIP_ASSET_RE = re.compile(
-    r"^/arch/sp(?P<month>\d{2})(?P<day>\d{2})(?P<year>\d{4})\.[A-Za-z0-9]+$",
-    re.IGNORECASE,
+# One pass classifies a path into the recovery buckets below. The archive-year
+# branch stays case-sensitive; the comic branches ignore case.
+_ORDER_DISPATCH_RE = re.compile(
+    r"^(?:"
+    r"(?i:/sp(?P<page_month>\d{2})(?P<page_day>\d{2})(?P<page_year>\d{4})\.html)"
+    r"|(?i:/arch/sp(?P<asset_month>\d{2})(?P<asset_day>\d{2})(?P<asset_year>\d{4})\.[A-Za-z0-9]+)"
+    r"|(?i:/1stcomic-page(?P<first_comic_page>\d+)\.html)"
+    r"|/archive/(?P<archive_year>\d{4})/?"
+    r")$"
 )
-_FIRST_COMIC_PAGE_RE = re.compile(r"^/1stcomic-page(?P<page>\d+)\.html$", re.IGNORECASE)
-_ARCHIVE_YEAR_RE = re.compile(r"^/archive/(?P<year>\d{4})/?$")
+# Every dispatch alternative starts with one of these characters after the "/",
+# so most other paths can be rejected without entering the regex engine.
+_ORDER_DISPATCH_LEADS = frozenset("sSaA1")
 
 
 def _record_in_window(record: CaptureRecord, config: RecoveryConfig) -> bool:
-    parsed = urlparse(record.original)
+    parsed = parse_url(record.original)
     if parsed.query or parsed.fragment:
         return False
     return config.from_timestamp <= record.timestamp <= config.effective_to_timestamp
 
 
-def _normalized_missing_keys(config: RecoveryConfig) -> set[str]:
-    return {
-        canonical_identity_key(
+# Returns None when only_missing_urls is empty, meaning no filtering.
+def only_missing_predicate(config: RecoveryConfig) -> Callable[[str], bool] | None:
+    if not config.only_missing_urls:
+        return None
+
+    @lru_cache(maxsize=None)
+    def identity_key(url: str) -> str:
+        return canonical_identity_key(
             url,
             canonical_host=config.canonical_host,
             equivalent_hosts=config.equivalent_hosts,
         )
-        for url in config.only_missing_urls
-    }
 
+    missing_keys = frozenset(identity_key(url) for url in config.only_missing_urls)
+
+    def is_missing(original_url: str) -> bool:
+        return identity_key(original_url) in missing_keys
 
-def _recovery_order_key(record: CaptureRecord) -> tuple[int, tuple[int, int, int], int, str]:
-    parsed = urlparse(record.original)
+    return is_missing
+
+
+def filter_only_missing(
+    records: Sequence[CaptureRecord],
+    config: RecoveryConfig,
+) -> list[CaptureRecord]:
+    is_missing = only_missing_predicate(config)
+    if is_missing is None:
+        return list(records)
+    return [record for record in records if is_missing(record.original)]
+
+
+def _recovery_order_key(record: CaptureRecord) -> tuple[int, tuple[int, int, int], str, str]:
+    parsed = parse_url(record.original)
     path = parsed.path or "/"
 
-    strip_page = _STRIP_PAGE_RE.match(path)
-    if strip_page:
-        year = int(strip_page.group("year"))
-        month = int(strip_page.group("month"))
-        day = int(strip_page.group("day"))
-        return (0, (year, month, day), int(record.timestamp), record.original)
-
-    strip_asset = _STRIP_ASSET_RE.match(path)
-    if strip_asset:
-        year = int(strip_asset.group("year"))
-        month = int(strip_asset.group("month"))
-        day = int(strip_asset.group("day"))
-        return (1, (year, month, day), int(record.timestamp), record.original)
-
-    first_comic = _FIRST_COMIC_PAGE_RE.match(path)
-    if first_comic:
-        page_number = int(first_comic.group("page"))
-        return (2, (2001, 1, page_number), int(record.timestamp), record.original)
-
-    archive_year = _ARCHIVE_YEAR_RE.match(path)
-    if archive_year:
-        year = int(archive_year.group("year"))
-        return (3, (year, 1, 1), int(record.timestamp), record.original)
+    match = _ORDER_DISPATCH_RE.match(path) if path[1:2] in _ORDER_DISPATCH_LEADS else None
+    if match:
+        kind = match.lastgroup
+        if kind == "page_year":
+            year = int(match.group("page_year"))
+            month = int(match.group("page_month"))
+            day = int(match.group("page_day"))
+            return (0, (year, month, day), record.timestamp, record.original)
+        if kind == "asset_year":
+            year = int(match.group("asset_year"))
+            month = int(match.group("asset_month"))
+            day = int(match.group("asset_day"))
+            return (1, (year, month, day), record.timestamp, record.original)
+        if kind == "first_comic_page":
+            page_number = int(match.group("first_comic_page"))
+            return (2, (2001, 1, page_number), record.timestamp, record.original)
+        year = int(match.group("archive_year"))
+        return (3, (year, 1, 1), record.timestamp, record.original)
 
     if path in {"/", "/index.html"}:
-        return (6, (9999, 12, 31), int(record.timestamp), record.original)
+        return (6, (9999, 12, 31), record.timestamp, record.original)
 
     if path.lower().endswith(".html") or path.endswith("/"):
-        return (4, (9999, 12, 31), int(record.timestamp), record.original)
+        return (4, (9999, 12, 31), record.timestamp, record.original)
 
-    return (5, (9999, 12, 31), int(record.timestamp), record.original)
+    return (5, (9999, 12, 31), record.timestamp, record.original)
 
 
-def _capture_rows_to_records(rows: Sequence[dict[str, object]]) -> list[CaptureRecord]:
+def _capture_rows_to_records(rows: Iterable[dict[str, object]]) -> list[CaptureRecord]:
     converted: list[CaptureRecord] = []
     for row in rows:
         converted.append(
             CaptureRecord(
                 timestamp=str(row.get("timestamp", "")),
                 original=str(row.get("original", "")),
-                mimetype=str(row.get("mimetype", "application/octet-stream")),
+                mimetype=sys.intern(str(row.get("mimetype", "application/octet-stream"))),
                 statuscode=int(row.get("statuscode", 0) or 0),
                 digest=str(row.get("digest") or "") or None,
             )
@@ -115,7 +151,7 @@ def _capture_rows_to_records(rows: Sequence[dict[str, object]]) -> list[CaptureR
     return converted
 
 
-def _provenance_from_rows(rows: Sequence[dict[str, object]]) -> list[ProvenanceRecord]:
+def _provenance_from_rows(rows: Iterable[dict[str, object]]) -> list[ProvenanceRecord]:
     parsed: list[ProvenanceRecord] = []
     for row in rows:
         parsed.append(
@@ -131,6 +167,23 @@ def _provenance_from_rows(rows: Sequence[dict[str, object]]) -> list[ProvenanceR
     return parsed
 
 
+def _select_canonical(
+    discovered: Sequence[CaptureRecord],
+    config: RecoveryConfig,
+) -> list[CaptureRecord]:
+    canonical_map = canonicalize_by_original_url(
+        discovered,
+        canonical_host=config.canonical_host,
+        equivalent_hosts=config.equivalent_hosts,
+    )
+    # Filter before ordering so sort keys are only computed for targeted records.
+    candidates = filter_only_missing(list(canonical_map.values()), config)
+    if 0 < config.max_canonical < len(candidates):
+        return heapq.nsmallest(config.max_canonical, candidates, key=_recovery_order_key)
+    candidates.sort(key=_recovery_order_key)
+    return candidates
+
+
 def discover_phase(config: RecoveryConfig) -> tuple[list[CaptureRecord], list[CaptureRecord]]:
     discovered_raw = fetch_cdx_records(
         domain=config.domain,
@@ -139,33 +192,7 @@ def discover_phase(config: RecoveryConfig) -> tuple[list[CaptureRecord], list[Ca
         limit=max(config.max_canonical * 20, 5000) if config.max_canonical else 50000,
     )
     discovered = [record for record in discovered_raw if _record_in_window(record, config)]
-
-    canonical_map = canonicalize_by_original_url(
-        discovered,
-        canonical_host=config.canonical_host,
-        equivalent_hosts=config.equivalent_hosts,
-    )
-    canonical_all = sorted(canonical_map.values(), key=_recovery_order_key)
-
-    if config.only_missing_urls:
-        missing_keys = _normalized_missing_keys(config)
-        canonical_all = [
-            record
-            for record in canonical_all
-            if canonical_identity_key(
-                record.original,
-                canonical_host=config.canonical_host,
-                equivalent_hosts=config.equivalent_hosts,
-            )
-            in missing_keys
-        ]
-
-    if config.max_canonical > 0:
-        canonical_selected = canonical_all[: config.max_canonical]
-    else:
-        canonical_selected = canonical_all
-
-    return discovered, canonical_selected
+    return discovered, _select_canonical(discovered, config)
 
 
 def recover_phase(
@@ -175,15 +202,18 @@ def recover_phase(
     fetcher: Fetcher | None = None,
     on_record: ProvenanceCallback | None = None,
 ) -> list[ProvenanceRecord]:
-    return recover_captures(
-        canonical_records,
-        output_root=config.output_root,
-        request_interval_seconds=config.request_interval_seconds,
-        fetcher=fetcher,
-        canonical_host=config.canonical_host,
-        equivalent_hosts=config.equivalent_hosts,
-        on_record=on_record,
-    )
+    with HashCache(config.output_root / "state" / "artifact_hashes.sqlite3") as hash_cache:
+        return recover_captures(
+            canonical_records,
+            output_root=config.output_root,
+            request_interval_seconds=config.request_interval_seconds,
+            fetcher=fetcher,
+            canonical_host=config.canonical_host,
+            equivalent_hosts=config.equivalent_hosts,
+            on_record=on_record,
+            max_concurrency=config.max_concurrency,
+            hash_cache=hash_cache,
+        )
 
 
 def _build_referenced_asset_captures(
@@ -193,24 +223,14 @@ def _build_referenced_asset_captures(
     canonical_host: str,
     equivalent_hosts: Collection[str],
 ) -> list[CaptureRecord]:
-    existing_local_paths = {
-        record.local_path
-        for record in provenance_records
-        if record.status in {"recovered", "skipped_existing"}
-    }
+    existing_local_paths, html_records = recovered_html_pages(provenance_records)
     candidates: dict[str, CaptureRecord] = {}
 
-    for record in provenance_records:
-        if record.status not in {"recovered", "skipped_existing"}:
-            continue
-        if not record.local_path.lower().endswith((".html", ".htm")):
+    for record in html_records:
+        try:
+            html = (output_root / record.local_path).read_text(encoding="utf-8", errors="ignore")
+        except FileNotFoundError:
             continue
-
-        page_path = output_root / record.local_path
-        if not page_path.exists():
-            continue
-
-        html = page_path.read_text(encoding="utf-8", errors="ignore")
         for asset_url in extract_internal_asset_urls(
             html,
             page_original_url=record.original_url,
@@ -244,10 +264,11 @@ def report_phase(
     provenance_records: Sequence[ProvenanceRecord],
 ) -> None:
     discovered_urls = {record.original for record in canonical_records}
-    provenance_rows = [record.as_dict() for record in provenance_records]
+    provenance_rows = [provenance_row(record) for record in provenance_records]
 
-    summary = compute_coverage(discovered_urls, provenance_rows)
-    gaps = build_gap_register(discovered_urls, provenance_rows)
+    provenance_index = index_provenance_rows(provenance_rows)
+    summary = compute_coverage(discovered_urls, provenance_index)
+    gaps = build_gap_register(discovered_urls, provenance_index)
 
     write_reports(
         output_root=config.output_root,
@@ -279,50 +300,32 @@ def run_pipeline(
         discovered, canonical = discover_phase(config)
     else:
         discovered = [record for record in discovered_records if _record_in_window(record, config)]
-        canonical_map = canonicalize_by_original_url(
-            discovered,
+        canonical = _select_canonical(discovered, config)
+
+    write_captures_jsonl(discovered_file, discovered)
+    write_captures_jsonl(canonical_file, canonical)
+
+    with jsonl_appender(
+        provenance_file,
+        truncate=True,
+        serialize=provenance_to_jsonl_line,
+    ) as append_provenance:
+        recovered = recover_phase(config, canonical, fetcher=fetcher, on_record=append_provenance)
+        referenced_assets = _build_referenced_asset_captures(
+            config.output_root,
+            recovered,
             canonical_host=config.canonical_host,
             equivalent_hosts=config.equivalent_hosts,
         )
-        canonical = sorted(canonical_map.values(), key=_recovery_order_key)
-        if config.only_missing_urls:
-            missing_keys = _normalized_missing_keys(config)
-            canonical = [
-                record
-                for record in canonical
-                if canonical_identity_key(
-                    record.original,
-                    canonical_host=config.canonical_host,
-                    equivalent_hosts=config.equivalent_hosts,
+        if referenced_assets:
+            recovered.extend(
+                recover_phase(
+                    config,
+                    referenced_assets,
+                    fetcher=fetcher,
+                    on_record=append_provenance,
                 )
-                in missing_keys
-            ]
-        if config.max_canonical > 0:
-            canonical = canonical[: config.max_canonical]
-
-    write_jsonl(discovered_file, [capture_to_dict(record) for record in discovered])
-    write_jsonl(canonical_file, [capture_to_dict(record) for record in canonical])
-    write_jsonl(provenance_file, [])
-
-    def _append_provenance(record: ProvenanceRecord) -> None:
-        append_jsonl(provenance_file, record.as_dict())
-
-    recovered = recover_phase(config, canonical, fetcher=fetcher, on_record=_append_provenance)
-    referenced_assets = _build_referenced_asset_captures(
-        config.output_root,
-        recovered,
-        canonical_host=config.canonical_host,
-        equivalent_hosts=config.equivalent_hosts,
-    )
-    if referenced_assets:
-        recovered.extend(
-            recover_phase(
-                config,
-                referenced_assets,
-                fetcher=fetcher,
-                on_record=_append_provenance,
             )
-        )
 
     rewrite_recovered_html_files(
         config.output_root,
@@ -330,6 +333,7 @@ def run_pipeline(
         unresolved_csv_path=state_dir / "unresolved_links.csv",
         canonical_host=config.canonical_host,
         equivalent_hosts=config.equivalent_hosts,
+        workers=config.rewrite_workers,
     )
 
     report_phase(config, canonical, recovered)
@@ -337,15 +341,12 @@ def run_pipeline(
     return PipelineRunResult(
         discovered_count=len(discovered),
         canonical_count=len(canonical),
-        recovered_count=sum(1 for row in recovered if row.status in {"recovered", "skipped_existing"}),
+        recovered_count=sum(1 for row in recovered if row.status in RECOVERED_STATUSES),
     )
 
 
 def run_report_only(config: RecoveryConfig) -> None:
     state_dir = config.output_root / "state"
-    canonical_rows = read_jsonl(state_dir / "canonical_urls.jsonl")
-    provenance_rows = read_jsonl(state_dir / "provenance.jsonl")
-
-    canonical_records = _capture_rows_to_records(canonical_rows)
-    provenance_records = _provenance_from_rows(provenance_rows)
+    canonical_records = _capture_rows_to_records(iter_jsonl(state_dir / "canonical_urls.jsonl"))
+    provenance_records = _provenance_from_rows(iter_jsonl(state_dir / "provenance.jsonl"))
     report_phase(config, canonical_records, provenance_records)
@@ -2,26 +2,43 @@
 
 from __future__ import annotations
 
+import http.client
+import os
+import threading
 import time
 from collections.abc import Collection
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
 from pathlib import Path
 from typing import Callable, Sequence
 from urllib.error import HTTPError
-from urllib.parse import urlparse
-from urllib.request import Request, urlopen
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, getproxies, urlopen
 
+from sp_recovery.config import DEFAULT_MAX_CONCURRENCY
 from sp_recovery.discovery import CaptureRecord
-from sp_recovery.io_utils import sha256_hex, write_bytes
+from sp_recovery.hash_cache import HashCache
+from sp_recovery.io_utils import forget_created_dirs, sha256_file, sha256_hex, write_bytes
 from sp_recovery.url_utils import (
     DEFAULT_CANONICAL_SITE_HOST,
     DEFAULT_EQUIVALENT_SITE_HOSTS,
     canonicalize_site_host,
+    parse_url,
 )
 
 Fetcher = Callable[[str], tuple[int, bytes]]
 ProvenanceCallback = Callable[["ProvenanceRecord"], None]
 DEFAULT_FETCH_RETRIES = 3
+RECOVERED_STATUSES = frozenset({"recovered", "skipped_existing", "copied_by_digest"})
+_FETCH_TIMEOUT_SECONDS = 30
+_MAX_REDIRECTS = 10
+_REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+_REQUEST_HEADERS = {"User-Agent": "sp-recovery/0.1 (+archive-friendly)"}
+_THREAD_STATE = threading.local()
+_OPEN_CONNECTIONS: set[http.client.HTTPConnection] = set()
+_OPEN_CONNECTIONS_LOCK = threading.Lock()
 
 
 @dataclass(frozen=True, slots=True)
@@ -44,6 +61,18 @@ class ProvenanceRecord:
         }
 
 
+# Byte-identical to json.dumps(record.as_dict(), sort_keys=True).
+def provenance_to_jsonl_line(record: ProvenanceRecord) -> str:
+    return (
+        f'{{"local_path": {encode_basestring_ascii(record.local_path)}, '
+        f'"original_url": {encode_basestring_ascii(record.original_url)}, '
+        f'"sha256": {encode_basestring_ascii(record.sha256)}, '
+        f'"source_url": {encode_basestring_ascii(record.source_url)}, '
+        f'"status": {encode_basestring_ascii(record.status)}, '
+        f'"timestamp": {encode_basestring_ascii(record.timestamp)}}}\n'
+    )
+
+
 def build_wayback_replay_url(timestamp: str, original_url: str) -> str:
     return f"https://web.archive.org/web/{timestamp}id_/{original_url}"
 
@@ -54,7 +83,18 @@ def local_relpath_from_original(
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
     equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
 ) -> str:
-    parsed = urlparse(original_url)
+    if not isinstance(equivalent_hosts, frozenset):
+        equivalent_hosts = frozenset(equivalent_hosts)
+    return _local_relpath(original_url, canonical_host, equivalent_hosts)
+
+
+@lru_cache(maxsize=1 << 17)
+def _local_relpath(
+    original_url: str,
+    canonical_host: str,
+    equivalent_hosts: frozenset[str],
+) -> str:
+    parsed = parse_url(original_url)
     host = canonicalize_site_host(
         parsed.netloc,
         canonical_host=canonical_host,
@@ -68,15 +108,142 @@ def local_relpath_from_original(
     return f"{host}/{normalized_path}"
 
 
-def _default_fetcher(source_url: str) -> tuple[int, bytes]:
-    request = Request(source_url, headers={"User-Agent": "sp-recovery/0.1 (+archive-friendly)"})
+def _open_connection(scheme: str, netloc: str) -> http.client.HTTPConnection:
+    connection: http.client.HTTPConnection
+    if scheme == "https":
+        connection = http.client.HTTPSConnection(netloc, timeout=_FETCH_TIMEOUT_SECONDS)
+    elif scheme == "http":
+        connection = http.client.HTTPConnection(netloc, timeout=_FETCH_TIMEOUT_SECONDS)
+    else:
+        raise ValueError(f"unsupported URL scheme: {scheme!r}")
+    with _OPEN_CONNECTIONS_LOCK:
+        _OPEN_CONNECTIONS.add(connection)
+    return connection
+
+
+def _close_connection(connection: http.client.HTTPConnection) -> None:
+    connection.close()
+    with _OPEN_CONNECTIONS_LOCK:
+        _OPEN_CONNECTIONS.discard(connection)
+
+
+# Closes the keep-alive connections of every thread. Threads that still hold a
+# closed connection open a fresh one on their next request.
+def _close_open_connections() -> None:
+    with _OPEN_CONNECTIONS_LOCK:
+        connections = list(_OPEN_CONNECTIONS)
+        _OPEN_CONNECTIONS.clear()
+    for connection in connections:
+        connection.close()
+
+
+def _exchange(
+    connection: http.client.HTTPConnection,
+    target: str,
+) -> tuple[int, str | None, bytes, bool]:
+    connection.request("GET", target, headers=_REQUEST_HEADERS)
+    response = connection.getresponse()
+    payload = response.read()
+    return response.status, response.getheader("Location"), payload, response.will_close
+
+
+def _request_once(url: str) -> tuple[int, str | None, bytes]:
+    parsed = urlsplit(url)
+    target = parsed.path or "/"
+    if parsed.query:
+        target = f"{target}?{parsed.query}"
+
+    # Keep one persistent connection per origin per thread so repeated fetches
+    # skip the TCP/TLS handshake.
+    connections: dict[tuple[str, str], http.client.HTTPConnection] | None
+    connections = getattr(_THREAD_STATE, "connections", None)
+    if connections is None:
+        connections = {}
+        _THREAD_STATE.connections = connections
+    key = (parsed.scheme, parsed.netloc)
+
+    connection = connections.pop(key, None)
+    result: tuple[int, str | None, bytes, bool] | None = None
+    if connection is not None and connection.sock is not None:
+        try:
+            result = _exchange(connection, target)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server dropped the idle keep-alive connection; reconnect below.
+            _close_connection(connection)
+        except Exception:
+            _close_connection(connection)
+            raise
+
+    if result is None:
+        connection = _open_connection(parsed.scheme, parsed.netloc)
+        try:
+            result = _exchange(connection, target)
+        except Exception:
+            _close_connection(connection)
+            raise
+
+    status_code, location, payload, will_close = result
+    if will_close:
+        _close_connection(connection)
+    else:
+        connections[key] = connection
+    return status_code, location, payload
+
+
+def _urlopen_fetcher(source_url: str) -> tuple[int, bytes]:
+    request = Request(source_url, headers=_REQUEST_HEADERS)
     try:
-        with urlopen(request, timeout=30) as response:
+        with urlopen(request, timeout=_FETCH_TIMEOUT_SECONDS) as response:
             return response.status, response.read()
     except HTTPError as error:
         return error.code, error.read()
 
 
+def _default_fetcher(source_url: str) -> tuple[int, bytes]:
+    url = source_url
+    for _ in range(_MAX_REDIRECTS + 1):
+        status_code, location, payload = _request_once(url)
+        if status_code not in _REDIRECT_STATUSES or not location:
+            break
+        url = urljoin(url, location)
+    return status_code, payload
+
+
+def _resolve_default_fetcher() -> Fetcher:
+    # http.client connections ignore proxy settings; urlopen honours them.
+    return _urlopen_fetcher if getproxies() else _default_fetcher
+
+
+def _existing_stat(destination: Path) -> os.stat_result | None:
+    try:
+        return destination.stat()
+    except FileNotFoundError:
+        return None
+
+
+def _skipped_existing_record(
+    capture: CaptureRecord,
+    *,
+    source_url: str,
+    local_relpath: str,
+    destination: Path,
+    existing: os.stat_result,
+    hash_cache: HashCache | None,
+) -> ProvenanceRecord:
+    return ProvenanceRecord(
+        original_url=capture.original,
+        timestamp=capture.timestamp,
+        source_url=source_url,
+        local_path=local_relpath,
+        sha256=(
+            hash_cache.sha256_for(destination, local_relpath, stat=existing)
+            if hash_cache is not None
+            else sha256_file(destination)
+        ),
+        status="skipped_existing",
+    )
+
+
 def recover_capture(
     capture: CaptureRecord,
     *,
@@ -85,6 +252,7 @@ def recover_capture(
     max_retries: int = DEFAULT_FETCH_RETRIES,
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
     equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
+    hash_cache: HashCache | None = None,
 ) -> ProvenanceRecord:
     local_relpath = local_relpath_from_original(
         capture.original,
@@ -94,18 +262,18 @@ def recover_capture(
     destination = output_root / local_relpath
     source_url = build_wayback_replay_url(capture.timestamp, capture.original)
 
-    if destination.exists() and destination.stat().st_size > 0:
-        payload = destination.read_bytes()
-        return ProvenanceRecord(
-            original_url=capture.original,
-            timestamp=capture.timestamp,
+    existing = _existing_stat(destination)
+    if existing is not None and existing.st_size > 0:
+        return _skipped_existing_record(
+            capture,
             source_url=source_url,
-            local_path=local_relpath,
-            sha256=sha256_hex(payload),
-            status="skipped_existing",
+            local_relpath=local_relpath,
+            destination=destination,
+            existing=existing,
+            hash_cache=hash_cache,
         )
 
-    active_fetcher = fetcher or _default_fetcher
+    active_fetcher = fetcher or _resolve_default_fetcher()
     attempts = max(1, max_retries)
     last_error: Exception | None = None
     for attempt in range(attempts):
@@ -128,19 +296,86 @@ def recover_capture(
         )
 
     status = "recovered" if status_code == 200 else f"fetch_failed_{status_code}"
+    payload_sha256 = sha256_hex(payload)
     if status_code == 200:
-        write_bytes(destination, payload)
+        # Artifacts can always be re-fetched, so skip the per-file fsync barrier.
+        write_bytes(destination, payload, durable=False)
+        if hash_cache is not None:
+            hash_cache.record(destination, local_relpath, payload_sha256)
 
     return ProvenanceRecord(
         original_url=capture.original,
         timestamp=capture.timestamp,
         source_url=source_url,
         local_path=local_relpath,
-        sha256=sha256_hex(payload),
+        sha256=payload_sha256,
         status=status,
     )
 
 
+def _copy_by_digest(
+    capture: CaptureRecord,
+    source: ProvenanceRecord,
+    *,
+    output_root: Path,
+    canonical_host: str,
+    equivalent_hosts: Collection[str],
+    hash_cache: HashCache | None,
+) -> ProvenanceRecord | None:
+    local_relpath = local_relpath_from_original(
+        capture.original,
+        canonical_host=canonical_host,
+        equivalent_hosts=equivalent_hosts,
+    )
+    destination = output_root / local_relpath
+    source_url = build_wayback_replay_url(capture.timestamp, capture.original)
+    existing = _existing_stat(destination)
+    if existing is not None and existing.st_size > 0:
+        return _skipped_existing_record(
+            capture,
+            source_url=source_url,
+            local_relpath=local_relpath,
+            destination=destination,
+            existing=existing,
+            hash_cache=hash_cache,
+        )
+    try:
+        payload = (output_root / source.local_path).read_bytes()
+    except FileNotFoundError:
+        return None
+
+    # Copy rather than link: HTML pages are rewritten in place per page later.
+    write_bytes(destination, payload, durable=False)
+    if hash_cache is not None:
+        hash_cache.record(destination, local_relpath, source.sha256)
+    return ProvenanceRecord(
+        original_url=capture.original,
+        timestamp=capture.timestamp,
+        source_url=source_url,
+        local_path=local_relpath,
+        sha256=source.sha256,
+        status="copied_by_digest",
+    )
+
+
+# Spaces request starts at least interval_seconds apart across all threads.
+class _RequestPacer:
+    def __init__(self, interval_seconds: float) -> None:
+        self._interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._next_start: float | None = None
+
+    def wait(self) -> None:
+        if self._interval_seconds <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = now if self._next_start is None else max(now, self._next_start)
+            self._next_start = start + self._interval_seconds
+        if start > now:
+            time.sleep(start - now)
+
+
 def recover_captures(
     captures: Sequence[CaptureRecord],
     *,
@@ -150,21 +385,141 @@ def recover_captures(
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
     equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
     on_record: ProvenanceCallback | None = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    hash_cache: HashCache | None = None,
 ) -> list[ProvenanceRecord]:
-    recovered: list[ProvenanceRecord] = []
-    for index, capture in enumerate(captures):
-        if index > 0 and request_interval_seconds > 0:
-            time.sleep(request_interval_seconds)
-
-        record = recover_capture(
-            capture,
+    active_fetcher = fetcher or _resolve_default_fetcher()
+    try:
+        if max_concurrency > 1 and len(captures) > 1:
+            return _recover_captures_concurrently(
+                captures,
+                output_root=output_root,
+                request_interval_seconds=request_interval_seconds,
+                fetcher=active_fetcher,
+                canonical_host=canonical_host,
+                equivalent_hosts=equivalent_hosts,
+                on_record=on_record,
+                max_concurrency=max_concurrency,
+                hash_cache=hash_cache,
+            )
+        return _recover_captures_serially(
+            captures,
             output_root=output_root,
-            fetcher=fetcher,
+            request_interval_seconds=request_interval_seconds,
+            fetcher=active_fetcher,
             canonical_host=canonical_host,
             equivalent_hosts=equivalent_hosts,
+            on_record=on_record,
+            hash_cache=hash_cache,
         )
+    finally:
+        forget_created_dirs()
+        if fetcher is None:
+            _close_open_connections()
+
+
+def _recover_captures_serially(
+    captures: Sequence[CaptureRecord],
+    *,
+    output_root: Path,
+    request_interval_seconds: float,
+    fetcher: Fetcher,
+    canonical_host: str,
+    equivalent_hosts: Collection[str],
+    on_record: ProvenanceCallback | None,
+    hash_cache: HashCache | None,
+) -> list[ProvenanceRecord]:
+    # Captures with the same CDX digest have identical bytes; fetch each once.
+    recovered_by_digest: dict[str, ProvenanceRecord] = {}
+    recovered: list[ProvenanceRecord] = []
+    for index, capture in enumerate(captures):
+        record = None
+        source = recovered_by_digest.get(capture.digest) if capture.digest else None
+        if source is not None:
+            record = _copy_by_digest(
+                capture,
+                source,
+                output_root=output_root,
+                canonical_host=canonical_host,
+                equivalent_hosts=equivalent_hosts,
+                hash_cache=hash_cache,
+            )
+
+        if record is None:
+            if index > 0 and request_interval_seconds > 0:
+                time.sleep(request_interval_seconds)
+
+            record = recover_capture(
+                capture,
+                output_root=output_root,
+                fetcher=fetcher,
+                canonical_host=canonical_host,
+                equivalent_hosts=equivalent_hosts,
+                hash_cache=hash_cache,
+            )
+            # Only freshly fetched bytes are safe to copy; a skipped file may
+            # already have been rewritten for its own location.
+            if capture.digest and record.status == "recovered":
+                recovered_by_digest.setdefault(capture.digest, record)
+
         recovered.append(record)
         if on_record is not None:
             on_record(record)
 
     return recovered
+
+
+def _recover_captures_concurrently(
+    captures: Sequence[CaptureRecord],
+    *,
+    output_root: Path,
+    request_interval_seconds: float,
+    fetcher: Fetcher,
+    canonical_host: str,
+    equivalent_hosts: Collection[str],
+    on_record: ProvenanceCallback | None,
+    max_concurrency: int,
+    hash_cache: HashCache | None,
+) -> list[ProvenanceRecord]:
+    # Overlap round trips without raising the overall request rate: starts are
+    # still paced globally, and callbacks run one at a time as records finish.
+    pacer = _RequestPacer(request_interval_seconds)
+    callback_lock = threading.Lock()
+    digest_lock = threading.Lock()
+    recovered_by_digest: dict[str, ProvenanceRecord] = {}
+
+    def recover_one(capture: CaptureRecord) -> ProvenanceRecord:
+        record = None
+        with digest_lock:
+            source = recovered_by_digest.get(capture.digest) if capture.digest else None
+        if source is not None:
+            record = _copy_by_digest(
+                capture,
+                source,
+                output_root=output_root,
+                canonical_host=canonical_host,
+                equivalent_hosts=equivalent_hosts,
+                hash_cache=hash_cache,
+            )
+
+        if record is None:
+            pacer.wait()
+            record = recover_capture(
+                capture,
+                output_root=output_root,
+                fetcher=fetcher,
+                canonical_host=canonical_host,
+                equivalent_hosts=equivalent_hosts,
+                hash_cache=hash_cache,
+            )
+            if capture.digest and record.status == "recovered":
+                with digest_lock:
+                    recovered_by_digest.setdefault(capture.digest, record)
+
+        if on_record is not None:
+            with callback_lock:
+                on_record(record)
+        return record
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        return list(executor.map(recover_one, captures))
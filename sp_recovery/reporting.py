@@ -5,11 +5,18 @@ from __future__ import annotations
 import csv
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Sequence
 
 from sp_recovery.io_utils import ensure_parent_dir
+from sp_recovery.recover import RECOVERED_STATUSES, ProvenanceRecord
 
-RECOVERED_STATUSES = {"recovered", "skipped_existing"}
+PROVENANCE_COLUMNS = ("original_url", "timestamp", "source_url", "sha256", "status", "local_path")
+_URL_COLUMN = PROVENANCE_COLUMNS.index("original_url")
+_STATUS_COLUMN = PROVENANCE_COLUMNS.index("status")
+
+ProvenanceRow = tuple[str, str, str, str, str, str]
+
+_CSV_BUFFER_SIZE = 1 << 20
 
 
 @dataclass(frozen=True, slots=True)
@@ -27,21 +34,64 @@ class GapEntry:
     likely_sources: str
 
 
-def compute_coverage(
-    discovered_urls: set[str],
-    provenance_rows: Iterable[dict[str, str]],
-) -> CoverageSummary:
+@dataclass(frozen=True, slots=True)
+class ProvenanceIndex:
+    status_by_url: dict[str, str]
+    recovered_urls: frozenset[str]
+
+
+def index_provenance(provenance_rows: Iterable[dict[str, str]]) -> ProvenanceIndex:
     status_by_url = {
         row["original_url"]: row.get("status", "unknown")
         for row in provenance_rows
         if row.get("original_url")
     }
+    return _index_status_by_url(status_by_url)
 
-    recovered_count = sum(
-        1
-        for original_url in discovered_urls
-        if status_by_url.get(original_url) in RECOVERED_STATUSES
+
+def _index_status_by_url(status_by_url: dict[str, str]) -> ProvenanceIndex:
+    recovered_urls = frozenset(
+        original_url
+        for original_url, status in status_by_url.items()
+        if status in RECOVERED_STATUSES
+    )
+    return ProvenanceIndex(status_by_url=status_by_url, recovered_urls=recovered_urls)
+
+
+def provenance_row(record: ProvenanceRecord) -> ProvenanceRow:
+    return (
+        record.original_url,
+        record.timestamp,
+        record.source_url,
+        record.sha256,
+        record.status,
+        record.local_path,
     )
+
+
+def index_provenance_rows(rows: Sequence[ProvenanceRow]) -> ProvenanceIndex:
+    urls = [row[_URL_COLUMN] for row in rows]
+    statuses = [row[_STATUS_COLUMN] for row in rows]
+    status_by_url = dict(zip(urls, statuses))
+    status_by_url.pop("", None)
+    return _index_status_by_url(status_by_url)
+
+
+def _as_provenance_index(
+    provenance: Iterable[dict[str, str]] | ProvenanceIndex,
+) -> ProvenanceIndex:
+    if isinstance(provenance, ProvenanceIndex):
+        return provenance
+    return index_provenance(provenance)
+
+
+def compute_coverage(
+    discovered_urls: set[str],
+    provenance_rows: Iterable[dict[str, str]] | ProvenanceIndex,
+) -> CoverageSummary:
+    index = _as_provenance_index(provenance_rows)
+
+    recovered_count = len(index.recovered_urls.intersection(discovered_urls))
     total = len(discovered_urls)
     missing_count = total - recovered_count
     recovery_percentage = round((recovered_count / total) * 100, 2) if total else 0.0
@@ -56,20 +106,14 @@ def compute_coverage(
 
 def build_gap_register(
     discovered_urls: set[str],
-    provenance_rows: Iterable[dict[str, str]],
+    provenance_rows: Iterable[dict[str, str]] | ProvenanceIndex,
 ) -> list[GapEntry]:
-    status_by_url = {
-        row["original_url"]: row.get("status", "unknown")
-        for row in provenance_rows
-        if row.get("original_url")
-    }
+    index = _as_provenance_index(provenance_rows)
+    status_by_url = index.status_by_url
 
     gaps: list[GapEntry] = []
-    for original_url in sorted(discovered_urls):
+    for original_url in sorted(set(discovered_urls).difference(index.recovered_urls)):
         status = status_by_url.get(original_url)
-        if status in RECOVERED_STATUSES:
-            continue
-
         if status is None:
             gaps.append(
                 GapEntry(
@@ -116,21 +160,24 @@ def render_coverage_report(
 
 def _write_gap_csv(path: Path, gaps: list[GapEntry]) -> None:
     ensure_parent_dir(path)
-    with path.open("w", newline="", encoding="utf-8") as handle:
+    with path.open("w", newline="", encoding="utf-8", buffering=_CSV_BUFFER_SIZE) as handle:
         writer = csv.writer(handle)
         writer.writerow(["original_url", "reason", "likely_source_options"])
-        for gap in gaps:
-            writer.writerow([gap.original_url, gap.reason, gap.likely_sources])
+        writer.writerows((gap.original_url, gap.reason, gap.likely_sources) for gap in gaps)
 
 
-def _write_provenance_csv(path: Path, provenance_rows: list[dict[str, str]]) -> None:
+def _write_provenance_csv(
+    path: Path,
+    provenance_rows: Iterable[ProvenanceRow | dict[str, str]],
+) -> None:
     ensure_parent_dir(path)
-    columns = ["original_url", "timestamp", "source_url", "sha256", "status", "local_path"]
-    with path.open("w", newline="", encoding="utf-8") as handle:
-        writer = csv.DictWriter(handle, fieldnames=columns)
-        writer.writeheader()
-        for row in provenance_rows:
-            writer.writerow({column: row.get(column, "") for column in columns})
+    with path.open("w", newline="", encoding="utf-8", buffering=_CSV_BUFFER_SIZE) as handle:
+        writer = csv.writer(handle)
+        writer.writerow(PROVENANCE_COLUMNS)
+        writer.writerows(
+            row if isinstance(row, tuple) else tuple(row.get(column, "") for column in PROVENANCE_COLUMNS)
+            for row in provenance_rows
+        )
 
 
 def write_reports(
@@ -138,7 +185,7 @@ def write_reports(
     output_root: Path,
     summary: CoverageSummary,
     gaps: list[GapEntry],
-    provenance_rows: list[dict[str, str]],
+    provenance_rows: Iterable[ProvenanceRow | dict[str, str]],
     date_range_notes: list[str],
 ) -> None:
     reports_dir = output_root / "reports"
@@ -4,15 +4,21 @@ from __future__ import annotations
 
 import csv
 from collections.abc import Collection
+from concurrent.futures import ProcessPoolExecutor
+import os
 import posixpath
 import re
+import stat
+import tempfile
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Sequence
+from typing import Callable, Iterable, Sequence
 from urllib.parse import urljoin, urlparse
 
+from sp_recovery.config import DEFAULT_REWRITE_WORKERS
 from sp_recovery.io_utils import ensure_parent_dir
-from sp_recovery.recover import ProvenanceRecord, local_relpath_from_original
+from sp_recovery.recover import RECOVERED_STATUSES, ProvenanceRecord, local_relpath_from_original
 from sp_recovery.url_utils import (
     DEFAULT_CANONICAL_SITE_HOST,
     DEFAULT_EQUIVALENT_SITE_HOSTS,
@@ -20,10 +26,18 @@ from sp_recovery.url_utils import (
     is_internal_site_netloc,
 )
 
+_HTML_SUFFIXES = (".html", ".htm")
+_CSV_BUFFER_SIZE = 1 << 20
+
 _ATTR_PATTERN = re.compile(
     r"(?P<attr>href|src)=(?P<quote>['\"])(?P<value>.*?)(?P=quote)",
     re.IGNORECASE,
 )
+# Pages are rewritten as bytes so only matched attribute values are decoded.
+_ATTR_BYTES_PATTERN = re.compile(
+    rb"(?P<attr>href|src)=(?P<quote>['\"])(?P<value>.*?)(?P=quote)",
+    re.IGNORECASE,
+)
 
 
 @dataclass(frozen=True, slots=True)
@@ -39,6 +53,7 @@ class InternalTarget:
     fragment: str
 
 
+@lru_cache(maxsize=1 << 16)
 def _extract_wayback_original(absolute_url: str) -> str:
     parsed = urlparse(absolute_url)
     if parsed.netloc not in {"web.archive.org", "www.web.archive.org"}:
@@ -62,12 +77,33 @@ def _resolve_internal_target(
     *,
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
     equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
+) -> InternalTarget | None:
+    if not isinstance(equivalent_hosts, frozenset):
+        equivalent_hosts = frozenset(equivalent_hosts)
+    return _resolve_internal_target_cached(
+        raw_value,
+        page_original_url,
+        canonical_host,
+        equivalent_hosts,
+    )
+
+
+@lru_cache(maxsize=1 << 16)
+def _resolve_internal_target_cached(
+    raw_value: str,
+    page_original_url: str,
+    canonical_host: str,
+    equivalent_hosts: frozenset[str],
 ) -> InternalTarget | None:
     lowered = raw_value.lower()
     if lowered.startswith(("#", "mailto:", "javascript:", "data:")):
         return None
 
-    absolute = urljoin(page_original_url, raw_value)
+    # Absolute links resolve to themselves; only relative ones need urljoin.
+    if raw_value.startswith(("http://", "https://")):
+        absolute = raw_value
+    else:
+        absolute = urljoin(page_original_url, raw_value)
     original = _extract_wayback_original(absolute)
     parsed = urlparse(original)
 
@@ -100,49 +136,137 @@ def _resolve_internal_target(
     )
 
 
-def rewrite_html(
-    html: str,
+def _link_rewriter(
     *,
     page_original_url: str,
-    known_local_paths: set[str],
-    canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
-    equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
-) -> RewriteResult:
-    unresolved: list[tuple[str, str]] = []
+    known_local_paths: set[str] | frozenset[str],
+    unresolved: list[tuple[str, str]],
+    canonical_host: str,
+    equivalent_hosts: Collection[str],
+) -> Callable[[str], str | None]:
     source_local_path = local_relpath_from_original(
         page_original_url,
         canonical_host=canonical_host,
         equivalent_hosts=equivalent_hosts,
     )
     source_dir = posixpath.dirname(source_local_path)
+    if not isinstance(equivalent_hosts, frozenset):
+        equivalent_hosts = frozenset(equivalent_hosts)
+    is_known = known_local_paths.__contains__
+    add_unresolved = unresolved.append
 
-    def replace(match: re.Match[str]) -> str:
-        attr = match.group("attr")
-        quote = match.group("quote")
-        raw_value = match.group("value")
-
-        resolved = _resolve_internal_target(
+    def rewrite_link(raw_value: str) -> str | None:
+        resolved = _resolve_internal_target_cached(
             raw_value,
             page_original_url,
-            canonical_host=canonical_host,
-            equivalent_hosts=equivalent_hosts,
+            canonical_host,
+            equivalent_hosts,
         )
         if resolved is None:
-            return match.group(0)
+            return None
 
         suffix = f"#{resolved.fragment}" if resolved.fragment else ""
         local_path = resolved.local_path
-        if local_path not in known_local_paths:
-            unresolved.append((page_original_url, local_path))
+        if not is_known(local_path):
+            add_unresolved((page_original_url, local_path))
 
         relative_target = posixpath.relpath(local_path, start=source_dir)
-        rewritten = f"{relative_target}{suffix}"
+        return f"{relative_target}{suffix}"
+
+    return rewrite_link
+
+
+def rewrite_html(
+    html: str,
+    *,
+    page_original_url: str,
+    known_local_paths: set[str] | frozenset[str],
+    canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
+    equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
+) -> RewriteResult:
+    unresolved: list[tuple[str, str]] = []
+    rewrite_link = _link_rewriter(
+        page_original_url=page_original_url,
+        known_local_paths=known_local_paths,
+        unresolved=unresolved,
+        canonical_host=canonical_host,
+        equivalent_hosts=equivalent_hosts,
+    )
+
+    def replace(match: re.Match[str]) -> str:
+        attr, quote, raw_value = match.group("attr", "quote", "value")
+        rewritten = rewrite_link(raw_value)
+        if rewritten is None:
+            return match.group(0)
         return f"{attr}={quote}{rewritten}{quote}"
 
     rewritten_html = _ATTR_PATTERN.sub(replace, html)
     return RewriteResult(html=rewritten_html, unresolved_targets=unresolved)
 
 
+def _rewrite_html_file(
+    page_path: Path,
+    *,
+    page_original_url: str,
+    known_local_paths: frozenset[str],
+    canonical_host: str,
+    equivalent_hosts: Collection[str],
+) -> list[tuple[str, str]]:
+    unresolved: list[tuple[str, str]] = []
+    rewrite_link = _link_rewriter(
+        page_original_url=page_original_url,
+        known_local_paths=known_local_paths,
+        unresolved=unresolved,
+        canonical_host=canonical_host,
+        equivalent_hosts=equivalent_hosts,
+    )
+
+    def replace(match: re.Match[bytes]) -> bytes:
+        rewritten = rewrite_link(match.group("value").decode("utf-8", errors="ignore"))
+        if rewritten is None:
+            return match.group(0)
+        quote = match.group("quote")
+        return match.group("attr") + b"=" + quote + rewritten.encode("utf-8") + quote
+
+    # The attribute pattern never matches across a newline, so rewriting line
+    # by line produces the same page as rewriting it whole.
+    try:
+        source = page_path.open("rb")
+    except FileNotFoundError:
+        return []
+
+    temp_path: Path | None = None
+    try:
+        with source:
+            unchanged: list[bytes] = []
+            for line in source:
+                rewritten = _ATTR_BYTES_PATTERN.sub(replace, line)
+                if rewritten != line:
+                    break
+                unchanged.append(line)
+            else:
+                # Pages without changes are never written.
+                return unresolved
+
+            fd, temp_name = tempfile.mkstemp(
+                prefix=f".{page_path.name}.", suffix=".tmp", dir=str(page_path.parent)
+            )
+            temp_path = Path(temp_name)
+            with os.fdopen(fd, "wb") as target:
+                # mkstemp creates owner-only files; keep the page's own mode.
+                os.chmod(temp_path, stat.S_IMODE(os.fstat(source.fileno()).st_mode))
+                target.writelines(unchanged)
+                target.write(rewritten)
+                for line in source:
+                    target.write(_ATTR_BYTES_PATTERN.sub(replace, line))
+        os.replace(temp_path, page_path)
+    except BaseException:
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+        raise
+    return unresolved
+
+
 def extract_internal_asset_urls(
     html: str,
     *,
@@ -151,6 +275,7 @@ def extract_internal_asset_urls(
     equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
 ) -> list[str]:
     assets: list[str] = []
+    seen: set[str] = set()
     for match in _ATTR_PATTERN.finditer(html):
         attr = match.group("attr").lower()
         if attr != "src":
@@ -162,20 +287,74 @@ def extract_internal_asset_urls(
             canonical_host=canonical_host,
             equivalent_hosts=equivalent_hosts,
         )
-        if resolved is None:
+        if resolved is None or resolved.normalized_url in seen:
             continue
+        seen.add(resolved.normalized_url)
         assets.append(resolved.normalized_url)
 
-    return list(dict.fromkeys(assets))
+    return assets
+
+
+_WORKER_CONTEXT: tuple[frozenset[str], str, Collection[str]] = (
+    frozenset(),
+    DEFAULT_CANONICAL_SITE_HOST,
+    DEFAULT_EQUIVALENT_SITE_HOSTS,
+)
+
+
+def _init_rewrite_worker(
+    known_local_paths: frozenset[str],
+    canonical_host: str,
+    equivalent_hosts: Collection[str],
+) -> None:
+    global _WORKER_CONTEXT
+    _WORKER_CONTEXT = (known_local_paths, canonical_host, equivalent_hosts)
+
+
+def _rewrite_worker_page(item: tuple[Path, str]) -> list[tuple[str, str]]:
+    page_path, page_original_url = item
+    known_local_paths, canonical_host, equivalent_hosts = _WORKER_CONTEXT
+    return _rewrite_html_file(
+        page_path,
+        page_original_url=page_original_url,
+        known_local_paths=known_local_paths,
+        canonical_host=canonical_host,
+        equivalent_hosts=equivalent_hosts,
+    )
+
+
+def recovered_html_pages(
+    provenance_records: Sequence[ProvenanceRecord],
+) -> tuple[frozenset[str], list[ProvenanceRecord]]:
+    known_local_paths: set[str] = set()
+    html_records: list[ProvenanceRecord] = []
+    for record in provenance_records:
+        # "/" and "/index.html" share a local file; rewrite each file once.
+        if record.status not in RECOVERED_STATUSES or record.local_path in known_local_paths:
+            continue
+        known_local_paths.add(record.local_path)
+        if record.local_path.lower().endswith(_HTML_SUFFIXES):
+            html_records.append(record)
+    return frozenset(known_local_paths), html_records
+
+
+def _unique_targets(page_results: Iterable[list[tuple[str, str]]]) -> list[tuple[str, str]]:
+    unique: list[tuple[str, str]] = []
+    seen: set[tuple[str, str]] = set()
+    for page_unresolved in page_results:
+        for target in page_unresolved:
+            if target not in seen:
+                seen.add(target)
+                unique.append(target)
+    return unique
 
 
 def write_unresolved_links_csv(path: Path, unresolved_targets: list[tuple[str, str]]) -> None:
     ensure_parent_dir(path)
-    with path.open("w", newline="", encoding="utf-8") as handle:
+    with path.open("w", newline="", encoding="utf-8", buffering=_CSV_BUFFER_SIZE) as handle:
         writer = csv.writer(handle)
         writer.writerow(["source_url", "target_local_path"])
-        for source_url, target in unresolved_targets:
-            writer.writerow([source_url, target])
+        writer.writerows(unresolved_targets)
 
 
 def rewrite_recovered_html_files(
@@ -185,36 +364,38 @@ def rewrite_recovered_html_files(
     unresolved_csv_path: Path,
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
     equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
+    workers: int = DEFAULT_REWRITE_WORKERS,
 ) -> list[tuple[str, str]]:
-    known_local_paths = {
-        record.local_path
-        for record in provenance_records
-        if record.status in {"recovered", "skipped_existing"}
-    }
-    unresolved: list[tuple[str, str]] = []
-
-    for record in provenance_records:
-        if record.status not in {"recovered", "skipped_existing"}:
-            continue
-        if not record.local_path.lower().endswith((".html", ".htm")):
-            continue
-
-        page_path = output_root / record.local_path
-        if not page_path.exists():
-            continue
-
-        original_html = page_path.read_text(encoding="utf-8", errors="ignore")
-        result = rewrite_html(
-            original_html,
-            page_original_url=record.original_url,
-            known_local_paths=known_local_paths,
-            canonical_host=canonical_host,
-            equivalent_hosts=equivalent_hosts,
+    known_local_paths, html_records = recovered_html_pages(provenance_records)
+    pages = [(output_root / record.local_path, record.original_url) for record in html_records]
+
+    if workers > 1 and len(pages) > 1:
+        # Pages are rewritten independently; the shared lookup state is sent
+        # once per worker process instead of once per page.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_rewrite_worker,
+            initargs=(known_local_paths, canonical_host, equivalent_hosts),
+        ) as executor:
+            chunksize = max(1, len(pages) // (8 * workers))
+            unresolved = _unique_targets(
+                executor.map(_rewrite_worker_page, pages, chunksize=chunksize)
+            )
+    else:
+        unresolved = _unique_targets(
+            _rewrite_html_file(
+                page_path,
+                page_original_url=page_original_url,
+                known_local_paths=known_local_paths,
+                canonical_host=canonical_host,
+                equivalent_hosts=equivalent_hosts,
+            )
+            for page_path, page_original_url in pages
         )
-        if result.html != original_html:
-            page_path.write_text(result.html, encoding="utf-8")
-        unresolved.extend(result.unresolved_targets)
 
-    deduped = list(dict.fromkeys(unresolved))
-    write_unresolved_links_csv(unresolved_csv_path, deduped)
-    return deduped
+    # Frees this run's link caches; their keys already cover every input.
+    _resolve_internal_target_cached.cache_clear()
+    _extract_wayback_original.cache_clear()
+
+    write_unresolved_links_csv(unresolved_csv_path, unresolved)
+    return unresolved
@@ -3,12 +3,19 @@
 from __future__ import annotations
 
 from collections.abc import Collection
-from urllib.parse import urlparse
+from functools import lru_cache
+from urllib.parse import ParseResult, urlparse
 
 DEFAULT_CANONICAL_SITE_HOST = "somethingpositive.net"
 DEFAULT_EQUIVALENT_SITE_HOSTS = frozenset({"somethingpositive.net", "www.somethingpositive.net"})
 
 
+@lru_cache(maxsize=1 << 17)
+def parse_url(url: str) -> ParseResult:
+    return urlparse(url)
+
+
+@lru_cache(maxsize=4096)
 def normalize_site_host(netloc: str) -> str:
     host = netloc.lower().strip()
     if "@" in host:
@@ -27,7 +34,14 @@ def _normalized_equivalent_hosts(
     *,
     canonical_host: str,
     equivalent_hosts: Collection[str],
-) -> set[str]:
+) -> frozenset[str]:
+    if not isinstance(equivalent_hosts, frozenset):
+        equivalent_hosts = frozenset(equivalent_hosts)
+    return _normalized_host_set(canonical_host, equivalent_hosts)
+
+
+@lru_cache(maxsize=256)
+def _normalized_host_set(canonical_host: str, equivalent_hosts: frozenset[str]) -> frozenset[str]:
     normalized: set[str] = set()
     for host in equivalent_hosts:
         normalized_host = normalize_site_host(host)
@@ -36,7 +50,7 @@ def _normalized_equivalent_hosts(
     normalized_canonical = normalize_site_host(canonical_host)
     if normalized_canonical:
         normalized.add(normalized_canonical)
-    return normalized
+    return frozenset(normalized)
 
 
 def canonicalize_site_host(
@@ -78,7 +92,7 @@ def canonical_identity_key(
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
     equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
 ) -> str:
-    parsed = urlparse(original_url)
+    parsed = parse_url(original_url)
     host = canonicalize_site_host(
         parsed.netloc,
         canonical_host=canonical_host,
@@ -89,7 +103,7 @@ def canonical_identity_key(
     return f"{host}{path}{query}"
 
 
-def _strip_mirror_host_prefix(path: str, *, equivalent_hosts: set[str]) -> str:
+def _strip_mirror_host_prefix(path: str, *, equivalent_hosts: frozenset[str]) -> str:
     if not path.startswith("/"):
         return path
 
@@ -110,7 +124,18 @@ def canonical_internal_url(
     canonical_host: str = DEFAULT_CANONICAL_SITE_HOST,
     equivalent_hosts: Collection[str] = DEFAULT_EQUIVALENT_SITE_HOSTS,
 ) -> str:
-    parsed = urlparse(original_url)
+    if not isinstance(equivalent_hosts, frozenset):
+        equivalent_hosts = frozenset(equivalent_hosts)
+    return _canonical_internal_url(original_url, canonical_host, equivalent_hosts)
+
+
+@lru_cache(maxsize=1 << 16)
+def _canonical_internal_url(
+    original_url: str,
+    canonical_host: str,
+    equivalent_hosts: frozenset[str],
+) -> str:
+    parsed = parse_url(original_url)
     normalized_canonical = normalize_site_host(canonical_host) or DEFAULT_CANONICAL_SITE_HOST
     path = parsed.path or "/"
     normalized_equivalents = _normalized_equivalent_hosts(
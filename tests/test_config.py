@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from sp_recovery.config import RecoveryConfig
+import pytest
+
+from sp_recovery.config import RecoveryConfig, load_missing_urls_from_gap_csv
 
 
 def test_effective_to_timestamp_respects_modern_cutoff() -> None:
@@ -22,3 +24,47 @@ def test_effective_to_timestamp_respects_modern_cutoff() -> None:
     assert config.effective_to_timestamp == "20191231235959"
     assert config.canonical_host == "somethingpositive.net"
     assert config.equivalent_hosts == frozenset({"somethingpositive.net", "www.somethingpositive.net"})
+
+
+def test_config_rejects_malformed_dates() -> None:
+    with pytest.raises(ValueError):
+        RecoveryConfig(
+            domain="somethingpositive.net",
+            from_date="2001/01/01",
+            to_date="2019-12-31",
+            output_root=Path("output/demo"),
+            max_canonical=0,
+            request_interval_seconds=2.0,
+            only_missing_urls=set(),
+        )
+
+
+def test_config_accepts_unpadded_month_and_day() -> None:
+    config = RecoveryConfig(
+        domain="somethingpositive.net",
+        from_date="2001-1-1",
+        to_date="2019-12-3",
+        output_root=Path("output/demo"),
+        max_canonical=0,
+        request_interval_seconds=2.0,
+        only_missing_urls=set(),
+    )
+
+    assert config.from_timestamp == "20010101000000"
+    assert config.to_timestamp == "20191203235959"
+
+
+def test_load_missing_urls_from_gap_csv_reads_original_url_column(tmp_path: Path) -> None:
+    gap_csv = tmp_path / "gaps.csv"
+    gap_csv.write_text(
+        "status,original_url\n"
+        "missing, http://www.somethingpositive.net/sp1.html \n"
+        "missing,\n"
+        "short\n",
+        encoding="utf-8",
+    )
+    empty_csv = tmp_path / "empty.csv"
+    empty_csv.write_text("", encoding="utf-8")
+
+    assert load_missing_urls_from_gap_csv(gap_csv) == {"http://www.somethingpositive.net/sp1.html"}
+    assert load_missing_urls_from_gap_csv(empty_csv) == set()
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import json
 from urllib.parse import parse_qs, urlparse
 
 from sp_recovery.discovery import (
     CaptureRecord,
+    _build_window_ranker,
+    _window_rank,
     build_cdx_query_url,
     canonicalize_by_original_url,
+    capture_to_dict,
+    capture_to_jsonl_line,
     choose_canonical_capture,
     fetch_cdx_records,
     parse_cdx_rows,
@@ -38,6 +43,26 @@ def test_parse_cdx_rows_builds_capture_records() -> None:
     ]
 
 
+def test_parse_cdx_rows_handles_custom_header_order_and_short_rows() -> None:
+    rows = [
+        ["timestamp", "statuscode", "original"],
+        ["20240201000000", "200", "http://www.somethingpositive.net/sp02012024.html"],
+        ["20240202000000", "200"],
+    ]
+
+    parsed = parse_cdx_rows(rows)
+
+    assert parsed == [
+        CaptureRecord(
+            timestamp="20240201000000",
+            original="http://www.somethingpositive.net/sp02012024.html",
+            mimetype="application/octet-stream",
+            statuscode=200,
+            digest=None,
+        )
+    ]
+
+
 def test_build_cdx_query_url_adds_resume_key_only_when_present() -> None:
     url = build_cdx_query_url(
         url_pattern="somethingpositive.net/*",
@@ -282,3 +307,49 @@ def test_fetch_cdx_records_stops_when_resume_key_repeats() -> None:
 
     assert len(records) == 2
     assert len(calls) == 2
+
+
+def test_window_ranker_matches_linear_scan_for_overlapping_windows() -> None:
+    windows = (
+        ("20230101000000", "20250201235959"),
+        ("20210101000000", "20250201235959"),
+        ("20050101000000", "20071231235959"),
+    )
+    ranker = _build_window_ranker(windows)
+
+    for timestamp in (
+        "20010101000000",
+        "20050101000000",
+        "20060615000000",
+        "20071231235959",
+        "20200101000000",
+        "20210101000000",
+        "20221231235959",
+        "20230101000000",
+        "20250201235959",
+        "20260101000000",
+    ):
+        assert ranker.rank(timestamp) == _window_rank(timestamp, windows)
+
+
+def test_capture_to_jsonl_line_matches_sorted_json_dump() -> None:
+    captures = [
+        CaptureRecord(
+            timestamp="20020206001945",
+            original='http://www.somethingpositive.net/café "quoted".html',
+            mimetype="text/html",
+            statuscode=200,
+            digest="A",
+        ),
+        CaptureRecord(
+            timestamp="20020206001945",
+            original="http://www.somethingpositive.net/",
+            mimetype="warc/revisit",
+            statuscode=0,
+            digest=None,
+        ),
+    ]
+
+    for capture in captures:
+        expected = json.dumps(capture_to_dict(capture), sort_keys=True) + "\n"
+        assert capture_to_jsonl_line(capture) == expected
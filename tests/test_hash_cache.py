@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from sp_recovery.hash_cache import HashCache
+from sp_recovery.io_utils import sha256_hex
+
+
+def test_hash_cache_reuses_digest_until_file_metadata_changes(tmp_path: Path) -> None:
+    artifact = tmp_path / "somethingpositive.net" / "sp02012024.html"
+    artifact.parent.mkdir(parents=True)
+    artifact.write_bytes(b"<html>one</html>")
+    cache_path = tmp_path / "state" / "artifact_hashes.sqlite3"
+
+    with HashCache(cache_path) as cache:
+        cache.record(artifact, "somethingpositive.net/sp02012024.html", "cached-digest")
+
+    with HashCache(cache_path) as cache:
+        assert cache.sha256_for(artifact, "somethingpositive.net/sp02012024.html") == "cached-digest"
+
+        artifact.write_bytes(b"<html>two, longer</html>")
+        stat = artifact.stat()
+        os.utime(artifact, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert cache.sha256_for(artifact, "somethingpositive.net/sp02012024.html") == sha256_hex(
+            b"<html>two, longer</html>"
+        )
+
+
+def test_hash_cache_hashes_unknown_files(tmp_path: Path) -> None:
+    artifact = tmp_path / "arch" / "sp02012024.gif"
+    artifact.parent.mkdir(parents=True)
+    artifact.write_bytes(b"GIF89a")
+
+    with HashCache(tmp_path / "state" / "artifact_hashes.sqlite3") as cache:
+        assert cache.sha256_for(artifact, "arch/sp02012024.gif") == sha256_hex(b"GIF89a")
@@ -2,7 +2,18 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from sp_recovery.io_utils import write_bytes
+import pytest
+
+from sp_recovery.discovery import CaptureRecord, write_captures_jsonl
+from sp_recovery.io_utils import (
+    append_jsonl,
+    jsonl_appender,
+    read_jsonl,
+    sha256_file,
+    sha256_hex,
+    write_bytes,
+    write_jsonl,
+)
 
 
 def test_write_bytes_creates_parent_dirs_and_writes_payload(tmp_path: Path) -> None:
@@ -28,3 +39,92 @@ def test_write_bytes_replaces_existing_file_without_temp_leak(tmp_path: Path) ->
         if path.name.startswith(f".{target.name}.") and path.name.endswith(".tmp")
     ]
     assert leftovers == []
+
+
+def test_write_jsonl_round_trips_rows_with_sorted_keys(tmp_path: Path) -> None:
+    target = tmp_path / "state" / "rows.jsonl"
+
+    write_jsonl(target, [{"b": 1, "a": "x"}, {"a": "y"}])
+    append_jsonl(target, {"c": None, "a": "z"})
+
+    assert target.read_text(encoding="utf-8").splitlines() == [
+        '{"a": "x", "b": 1}',
+        '{"a": "y"}',
+        '{"a": "z", "c": null}',
+    ]
+    assert read_jsonl(target) == [{"a": "x", "b": 1}, {"a": "y"}, {"a": "z", "c": None}]
+
+
+def test_jsonl_appender_makes_each_row_visible_before_close(tmp_path: Path) -> None:
+    target = tmp_path / "state" / "provenance.jsonl"
+    target.parent.mkdir(parents=True)
+    target.write_text('{"stale": true}\n', encoding="utf-8")
+
+    with jsonl_appender(target, truncate=True) as append:
+        append({"original_url": "a"})
+        assert read_jsonl(target) == [{"original_url": "a"}]
+        append({"original_url": "b"})
+
+    assert read_jsonl(target) == [{"original_url": "a"}, {"original_url": "b"}]
+
+
+def test_write_captures_jsonl_streams_from_a_generator(tmp_path: Path) -> None:
+    target = tmp_path / "state" / "canonical_urls.jsonl"
+    captures = (
+        CaptureRecord(
+            timestamp=f"2002020600{index:04d}",
+            original=f"http://www.somethingpositive.net/sp{index}.html",
+            mimetype="text/html",
+            statuscode=200,
+            digest=None,
+        )
+        for index in range(3)
+    )
+
+    write_captures_jsonl(target, captures)
+
+    rows = read_jsonl(target)
+    assert [row["original"] for row in rows] == [
+        "http://www.somethingpositive.net/sp0.html",
+        "http://www.somethingpositive.net/sp1.html",
+        "http://www.somethingpositive.net/sp2.html",
+    ]
+    assert rows[0]["digest"] == ""
+
+
+def test_sha256_file_matches_in_memory_digest(tmp_path: Path) -> None:
+    target = tmp_path / "strip.gif"
+    payload = b"GIF89a" + bytes(range(256)) * 8192
+    target.write_bytes(payload)
+
+    assert sha256_file(target) == sha256_hex(payload)
+
+
+def test_write_bytes_without_durability_still_replaces_atomically(tmp_path: Path) -> None:
+    target = tmp_path / "mirror" / "arch" / "sp02012024.gif"
+
+    write_bytes(target, b"GIF89a", durable=False)
+
+    assert target.read_bytes() == b"GIF89a"
+    assert [path.name for path in target.parent.iterdir()] == ["sp02012024.gif"]
+
+
+def test_write_bytes_removes_temp_file_when_replace_fails(tmp_path: Path) -> None:
+    target = tmp_path / "mirror" / "images"
+    target.mkdir(parents=True)
+
+    with pytest.raises(OSError):
+        write_bytes(target, b"GIF89a", durable=False)
+
+    assert [path.name for path in target.parent.iterdir()] == ["images"]
+
+
+def test_write_bytes_recreates_directory_removed_between_writes(tmp_path: Path) -> None:
+    target = tmp_path / "mirror" / "arch" / "sp01012001.gif"
+    write_bytes(target, b"GIF89a", durable=False)
+    target.unlink()
+    target.parent.rmdir()
+
+    write_bytes(target, b"GIF89a", durable=False)
+
+    assert target.read_bytes() == b"GIF89a"
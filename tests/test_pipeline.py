@@ -144,6 +144,40 @@ def test_run_pipeline_can_target_only_missing_urls(tmp_path: Path) -> None:
     assert parsed[0]["original_url"] == "http://www.somethingpositive.net/sp2.html"
 
 
+def test_run_pipeline_applies_only_missing_filter_before_max_canonical(tmp_path: Path) -> None:
+    captures = [
+        CaptureRecord(
+            timestamp="20181201120000",
+            original=f"http://www.somethingpositive.net/sp{index}.html",
+            mimetype="text/html",
+            statuscode=200,
+            digest=f"D{index}",
+        )
+        for index in range(1, 4)
+    ]
+
+    def fetcher(_: str) -> tuple[int, bytes]:
+        return (200, b"<html></html>")
+
+    config = RecoveryConfig(
+        domain="somethingpositive.net",
+        from_date="2001-01-01",
+        to_date="2019-12-31",
+        output_root=tmp_path,
+        max_canonical=1,
+        request_interval_seconds=0.0,
+        only_missing_urls={"http://www.somethingpositive.net/sp3.html"},
+        modern_cutoff_date="2020-01-01",
+    )
+
+    run_pipeline(config, discovered_records=captures, fetcher=fetcher)
+
+    provenance_lines = (tmp_path / "state" / "provenance.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["original_url"] for line in provenance_lines] == [
+        "http://www.somethingpositive.net/sp3.html"
+    ]
+
+
 
 def test_run_pipeline_excludes_post_modern_cutoff_captures(tmp_path: Path) -> None:
     captures = [
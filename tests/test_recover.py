@@ -1,15 +1,27 @@
 from __future__ import annotations
 
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
 from pathlib import Path
+import threading
+import time
 
+import pytest
+
+from sp_recovery import io_utils, recover
 from sp_recovery.discovery import CaptureRecord
 from sp_recovery.recover import (
     ProvenanceRecord,
+    _close_open_connections,
+    _default_fetcher,
+    _resolve_default_fetcher,
     build_wayback_replay_url,
     local_relpath_from_original,
+    provenance_to_jsonl_line,
     recover_capture,
     recover_captures,
 )
+from sp_recovery.rewrite import rewrite_recovered_html_files
 
 
 def test_local_relpath_from_original_is_deterministic() -> None:
@@ -154,3 +166,375 @@ def test_recover_captures_invokes_on_record_callback_for_each_capture(tmp_path:
         "http://www.somethingpositive.net/sp02012024.html",
         "http://www.somethingpositive.net/sp02022024.html",
     ]
+
+
+def test_recover_captures_with_concurrency_keeps_input_order(tmp_path: Path) -> None:
+    captures = [
+        CaptureRecord(
+            timestamp=f"2024020112000{index}",
+            original=f"http://www.somethingpositive.net/sp0{index}022024.html",
+            mimetype="text/html",
+            statuscode=200,
+            digest=str(index),
+        )
+        for index in range(5)
+    ]
+    seen: list[str] = []
+
+    def fetcher(url: str) -> tuple[int, bytes]:
+        return (200, url.encode("utf-8"))
+
+    def on_record(record: ProvenanceRecord) -> None:
+        seen.append(record.original_url)
+
+    results = recover_captures(
+        captures,
+        output_root=tmp_path,
+        request_interval_seconds=0.0,
+        fetcher=fetcher,
+        on_record=on_record,
+        max_concurrency=3,
+    )
+
+    assert [record.original_url for record in results] == [capture.original for capture in captures]
+    assert all(record.status == "recovered" for record in results)
+    assert sorted(seen) == sorted(capture.original for capture in captures)
+
+
+def test_recover_captures_with_concurrency_paces_request_starts(tmp_path: Path) -> None:
+    captures = [
+        CaptureRecord(
+            timestamp=f"2024020112000{index}",
+            original=f"http://www.somethingpositive.net/sp0{index}022024.html",
+            mimetype="text/html",
+            statuscode=200,
+            digest=str(index),
+        )
+        for index in range(6)
+    ]
+    interval = 0.1
+    starts: list[float] = []
+    starts_lock = threading.Lock()
+
+    def fetcher(url: str) -> tuple[int, bytes]:
+        with starts_lock:
+            starts.append(time.monotonic())
+        # Outlast the interval so several workers are in flight at once.
+        time.sleep(3 * interval)
+        return (200, url.encode("utf-8"))
+
+    recover_captures(
+        captures,
+        output_root=tmp_path,
+        request_interval_seconds=interval,
+        fetcher=fetcher,
+        max_concurrency=3,
+    )
+
+    assert len(starts) == len(captures)
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    # Allow for scheduling jitter between the pacer releasing a thread and the fetch.
+    assert min(gaps) >= interval - 0.01
+
+
+def test_default_fetcher_reuses_connection_and_follows_redirects() -> None:
+    client_ports: list[int] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            client_ports.append(self.client_address[1])
+            if self.path == "/web/20240201120000id_/page":
+                self._respond(302, b"", location="/web/20240201120500id_/page")
+            elif self.path == "/web/20240201120500id_/page":
+                self._respond(200, b"<html>ok</html>")
+            else:
+                self._respond(404, b"missing")
+
+        def _respond(self, status: int, body: bytes, *, location: str | None = None) -> None:
+            self.send_response(status)
+            if location:
+                self.send_header("Location", location)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        base = f"http://127.0.0.1:{server.server_port}"
+        assert _default_fetcher(f"{base}/web/20240201120000id_/page") == (200, b"<html>ok</html>")
+        assert _default_fetcher(f"{base}/nope") == (404, b"missing")
+    finally:
+        _close_open_connections()
+        server.shutdown()
+        server.server_close()
+
+    assert len(client_ports) == 3
+    assert len(set(client_ports)) == 1
+
+
+def _serve(handler: type[BaseHTTPRequestHandler]) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_recover_captures_closes_keep_alive_connections(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    closed = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def handle(self) -> None:
+            super().handle()
+            closed.set()
+
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = _serve(Handler)
+    base = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(recover, "build_wayback_replay_url", lambda timestamp, original: f"{base}/{timestamp}")
+    capture = CaptureRecord(
+        timestamp="20240201120000",
+        original="http://www.somethingpositive.net/sp02012024.html",
+        mimetype="text/html",
+        statuscode=200,
+        digest="D",
+    )
+    try:
+        records = recover_captures([capture], output_root=tmp_path, request_interval_seconds=0.0)
+        assert closed.wait(timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [record.status for record in records] == ["recovered"]
+
+
+def test_resolved_fetcher_uses_urlopen_when_a_proxy_is_configured(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    requested: list[str] = []
+    proxy_lookups: list[dict[str, str]] = []
+
+    class ProxyHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            requested.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Length", "9")
+            self.end_headers()
+            self.wfile.write(b"via proxy")
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = _serve(ProxyHandler)
+    for name in ("no_proxy", "NO_PROXY", "HTTP_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("http_proxy", f"http://127.0.0.1:{server.server_port}")
+    real_getproxies = recover.getproxies
+
+    def counting_getproxies() -> dict[str, str]:
+        proxy_lookups.append(real_getproxies())
+        return proxy_lookups[-1]
+
+    monkeypatch.setattr(recover, "getproxies", counting_getproxies)
+    monkeypatch.setattr(recover, "build_wayback_replay_url", lambda timestamp, original: f"http://archive.invalid/{timestamp}")
+    captures = [
+        CaptureRecord(
+            timestamp=f"2024020112000{index}",
+            original=f"http://www.somethingpositive.net/sp0{index}022024.html",
+            mimetype="text/html",
+            statuscode=200,
+            digest=str(index),
+        )
+        for index in range(3)
+    ]
+    try:
+        fetcher = _resolve_default_fetcher()
+        assert fetcher is not _default_fetcher
+        assert fetcher("http://archive.invalid/page") == (200, b"via proxy")
+        records = recover_captures(captures, output_root=tmp_path, request_interval_seconds=0.0)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert requested[0] == "http://archive.invalid/page"
+    assert [record.status for record in records] == ["recovered"] * 3
+    assert len(requested) == 4
+    assert len(proxy_lookups) == 2
+
+
+def test_recover_captures_copies_repeat_digests_without_refetching(tmp_path: Path) -> None:
+    captures = [
+        CaptureRecord(
+            timestamp="20240201120000",
+            original="http://www.somethingpositive.net/images/logo.gif",
+            mimetype="image/gif",
+            statuscode=200,
+            digest="SAMEDIGEST",
+        ),
+        CaptureRecord(
+            timestamp="20240201120001",
+            original="http://www.somethingpositive.net/arch/logo.gif",
+            mimetype="image/gif",
+            statuscode=200,
+            digest="SAMEDIGEST",
+        ),
+    ]
+    calls: list[str] = []
+
+    def fetcher(url: str) -> tuple[int, bytes]:
+        calls.append(url)
+        return (200, b"GIF89a")
+
+    results = recover_captures(
+        captures,
+        output_root=tmp_path,
+        request_interval_seconds=0.0,
+        fetcher=fetcher,
+    )
+
+    assert len(calls) == 1
+    assert [record.status for record in results] == ["recovered", "copied_by_digest"]
+    assert results[1].sha256 == results[0].sha256
+    assert results[1].source_url == build_wayback_replay_url(captures[1].timestamp, captures[1].original)
+    assert (tmp_path / "somethingpositive.net" / "arch" / "logo.gif").read_bytes() == b"GIF89a"
+
+
+def test_recover_captures_keeps_existing_files_for_repeat_digests(tmp_path: Path) -> None:
+    captures = [
+        CaptureRecord(
+            timestamp="20240201120000",
+            original="http://www.somethingpositive.net/images/logo.gif",
+            mimetype="image/gif",
+            statuscode=200,
+            digest="SAMEDIGEST",
+        ),
+        CaptureRecord(
+            timestamp="20240201120001",
+            original="http://www.somethingpositive.net/arch/logo.gif",
+            mimetype="image/gif",
+            statuscode=200,
+            digest="SAMEDIGEST",
+        ),
+    ]
+    existing = tmp_path / "somethingpositive.net" / "arch" / "logo.gif"
+    existing.parent.mkdir(parents=True)
+    existing.write_bytes(b"kept")
+    calls: list[str] = []
+
+    def fetcher(url: str) -> tuple[int, bytes]:
+        calls.append(url)
+        return (200, b"GIF89a")
+
+    results = recover_captures(
+        captures,
+        output_root=tmp_path,
+        request_interval_seconds=0.0,
+        fetcher=fetcher,
+    )
+
+    assert len(calls) == 1
+    assert [record.status for record in results] == ["recovered", "skipped_existing"]
+    assert existing.read_bytes() == b"kept"
+
+
+def test_recover_captures_does_not_copy_from_skipped_existing_pages(tmp_path: Path) -> None:
+    home = CaptureRecord(
+        timestamp="20240201120000",
+        original="http://www.somethingpositive.net/index.html",
+        mimetype="text/html",
+        statuscode=200,
+        digest="SAMEPAGE",
+    )
+    strip = CaptureRecord(
+        timestamp="20240201120001",
+        original="http://www.somethingpositive.net/sp1.html",
+        mimetype="text/html",
+        statuscode=200,
+        digest="STRIP",
+    )
+    archive = CaptureRecord(
+        timestamp="20240201120002",
+        original="http://www.somethingpositive.net/archive/index.html",
+        mimetype="text/html",
+        statuscode=200,
+        digest="SAMEPAGE",
+    )
+
+    def fetcher(_: str) -> tuple[int, bytes]:
+        return (200, b'<a href="http://www.somethingpositive.net/sp1.html">next</a>')
+
+    def run(captures: list[CaptureRecord]) -> list[ProvenanceRecord]:
+        records = recover_captures(
+            captures,
+            output_root=tmp_path,
+            request_interval_seconds=0.0,
+            fetcher=fetcher,
+        )
+        rewrite_recovered_html_files(
+            tmp_path,
+            records,
+            unresolved_csv_path=tmp_path / "unresolved.csv",
+        )
+        return records
+
+    run([home, strip])
+    results = run([home, archive, strip])
+
+    assert [record.status for record in results] == ["skipped_existing", "recovered", "skipped_existing"]
+    archive_page = tmp_path / "somethingpositive.net" / "archive" / "index.html"
+    assert b'href="../sp1.html"' in archive_page.read_bytes()
+
+
+def test_recover_captures_forgets_created_directories_after_the_run(tmp_path: Path) -> None:
+    capture = CaptureRecord(
+        timestamp="20240201120000",
+        original="http://www.somethingpositive.net/arch/sp02012024.gif",
+        mimetype="image/gif",
+        statuscode=200,
+        digest="D",
+    )
+
+    def fetcher(_: str) -> tuple[int, bytes]:
+        return (200, b"GIF89a")
+
+    recover_captures([capture], output_root=tmp_path, request_interval_seconds=0.0, fetcher=fetcher)
+    (tmp_path / "somethingpositive.net" / "arch" / "sp02012024.gif").unlink()
+    (tmp_path / "somethingpositive.net" / "arch").rmdir()
+
+    assert not io_utils._CREATED_DIRS
+    records = recover_captures([capture], output_root=tmp_path, request_interval_seconds=0.0, fetcher=fetcher)
+
+    assert [record.status for record in records] == ["recovered"]
+
+
+def test_provenance_to_jsonl_line_matches_sorted_json_dumps() -> None:
+    record = ProvenanceRecord(
+        original_url="http://www.somethingpositive.net/caf\u00e9.html",
+        timestamp="20181201120000",
+        source_url='https://web.archive.org/web/20181201120000id_/http://www.somethingpositive.net/"q".html',
+        local_path="somethingpositive.net/caf\u00e9.html",
+        sha256="fetch_error:TimeoutError\\x",
+        status="fetch_error",
+    )
+
+    assert provenance_to_jsonl_line(record) == json.dumps(record.as_dict(), sort_keys=True) + "\n"
@@ -7,9 +7,12 @@ from sp_recovery.reporting import (
     GapEntry,
     build_gap_register,
     compute_coverage,
+    index_provenance_rows,
+    provenance_row,
     render_coverage_report,
     write_reports,
 )
+from sp_recovery.recover import ProvenanceRecord
 
 
 def test_compute_coverage_counts_recovered_and_missing() -> None:
@@ -128,3 +131,45 @@ def test_write_reports_creates_required_files(tmp_path: Path) -> None:
     assert (tmp_path / "reports" / "coverage_report.md").exists()
     assert (tmp_path / "reports" / "gap_register.csv").exists()
     assert (tmp_path / "reports" / "provenance_manifest.csv").exists()
+
+
+def test_provenance_rows_index_and_write_manifest_in_column_order(tmp_path: Path) -> None:
+    rows = [
+        provenance_row(
+            ProvenanceRecord(
+                original_url="http://www.somethingpositive.net/sp1.html",
+                timestamp="20240201120000",
+                source_url="https://web.archive.org/web/20240201120000id_/http://www.somethingpositive.net/sp1.html",
+                local_path="sp1.html",
+                sha256="abc",
+                status="recovered",
+            )
+        ),
+        provenance_row(
+            ProvenanceRecord(
+                original_url="http://www.somethingpositive.net/sp2.html",
+                timestamp="20240201120000",
+                source_url="",
+                local_path="",
+                sha256="",
+                status="http_404",
+            )
+        ),
+    ]
+
+    index = index_provenance_rows(rows)
+    assert index.recovered_urls == {"http://www.somethingpositive.net/sp1.html"}
+    assert index.status_by_url["http://www.somethingpositive.net/sp2.html"] == "http_404"
+
+    summary = compute_coverage({row[0] for row in rows}, index)
+    write_reports(
+        output_root=tmp_path,
+        summary=summary,
+        gaps=build_gap_register({row[0] for row in rows}, index),
+        provenance_rows=rows,
+        date_range_notes=[],
+    )
+
+    manifest = (tmp_path / "reports" / "provenance_manifest.csv").read_text(encoding="utf-8").splitlines()
+    assert manifest[0] == "original_url,timestamp,source_url,sha256,status,local_path"
+    assert manifest[1].endswith(",abc,recovered,sp1.html")
@@ -2,12 +2,17 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import pytest
+
 from sp_recovery.rewrite import (
     RewriteResult,
     extract_internal_asset_urls,
     rewrite_html,
+    recovered_html_pages,
+    rewrite_recovered_html_files,
     write_unresolved_links_csv,
 )
+from sp_recovery.recover import ProvenanceRecord
 
 
 def test_rewrite_html_converts_internal_links_to_local_paths() -> None:
@@ -119,3 +124,163 @@ def test_rewrite_html_migrates_old_host_prefixed_mirror_paths() -> None:
 
     assert 'href="sp02022024.html"' in result.html
     assert 'src="arch/sp02012024.gif"' in result.html
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rewrite_recovered_html_files_rewrites_pages_in_place(tmp_path: Path, workers: int) -> None:
+    site_root = tmp_path / "somethingpositive.net"
+    site_root.mkdir()
+    (site_root / "index.html").write_text(
+        '<html>\n<a href="http://www.somethingpositive.net/sp1.html">1</a>\n'
+        '<a href="http://www.somethingpositive.net/sp9.html">9</a>\n</html>\n',
+        encoding="utf-8",
+    )
+    (site_root / "sp1.html").write_text("<html>\n<p>no links</p>\n</html>\n", encoding="utf-8")
+    records = [
+        ProvenanceRecord(
+            original_url=f"http://www.somethingpositive.net/{name}",
+            timestamp="20181201120000",
+            source_url="",
+            local_path=f"somethingpositive.net/{name}",
+            sha256="",
+            status="recovered",
+        )
+        for name in ("index.html", "sp1.html", "missing.html")
+    ]
+
+    unresolved = rewrite_recovered_html_files(
+        tmp_path,
+        records,
+        unresolved_csv_path=tmp_path / "reports" / "unresolved_links.csv",
+        workers=workers,
+    )
+
+    assert (site_root / "index.html").read_text(encoding="utf-8") == (
+        '<html>\n<a href="sp1.html">1</a>\n<a href="sp9.html">9</a>\n</html>\n'
+    )
+    assert (site_root / "sp1.html").read_text(encoding="utf-8") == "<html>\n<p>no links</p>\n</html>\n"
+    assert unresolved == [("http://www.somethingpositive.net/index.html", "somethingpositive.net/sp9.html")]
+    assert not list(site_root.glob("*.tmp"))
+
+
+def test_rewrite_recovered_html_files_rewrites_shared_local_paths_once(tmp_path: Path) -> None:
+    site_root = tmp_path / "somethingpositive.net"
+    site_root.mkdir()
+    (site_root / "index.html").write_text(
+        '<a href="http://www.somethingpositive.net/sp1.html">1</a>\n', encoding="utf-8"
+    )
+    (site_root / "sp1.html").write_text("<p>no links</p>\n", encoding="utf-8")
+    records = [
+        ProvenanceRecord(
+            original_url=f"http://www.somethingpositive.net/{path}",
+            timestamp="20181201120000",
+            source_url="",
+            local_path=local_path,
+            sha256="",
+            status=status,
+        )
+        for path, local_path, status in (
+            ("", "somethingpositive.net/index.html", "recovered"),
+            ("index.html", "somethingpositive.net/index.html", "skipped_existing"),
+            ("sp1.html", "somethingpositive.net/sp1.html", "recovered"),
+        )
+    ]
+
+    _, html_records = recovered_html_pages(records)
+    assert [record.local_path for record in html_records] == [
+        "somethingpositive.net/index.html",
+        "somethingpositive.net/sp1.html",
+    ]
+
+    unresolved = rewrite_recovered_html_files(
+        tmp_path,
+        records,
+        unresolved_csv_path=tmp_path / "reports" / "unresolved_links.csv",
+        workers=2,
+    )
+
+    assert (site_root / "index.html").read_text(encoding="utf-8") == '<a href="sp1.html">1</a>\n'
+    assert unresolved == []
+    assert not list(site_root.glob("*.tmp"))
+
+
+def test_rewrite_recovered_html_files_preserves_non_utf8_bytes(tmp_path: Path) -> None:
+    site_root = tmp_path / "somethingpositive.net"
+    site_root.mkdir()
+    page = site_root / "index.html"
+    page.write_bytes(b'<p>caf\xe9</p>\r\n<a href="http://www.somethingpositive.net/sp1.html">1</a>\r\n')
+    records = [
+        ProvenanceRecord(
+            original_url="http://www.somethingpositive.net/index.html",
+            timestamp="20181201120000",
+            source_url="",
+            local_path="somethingpositive.net/index.html",
+            sha256="",
+            status="recovered",
+        )
+    ]
+
+    rewrite_recovered_html_files(
+        tmp_path,
+        records,
+        unresolved_csv_path=tmp_path / "reports" / "unresolved_links.csv",
+    )
+
+    assert page.read_bytes() == b'<p>caf\xe9</p>\r\n<a href="sp1.html">1</a>\r\n'
+
+
+def test_rewrite_recovered_html_files_leaves_unchanged_pages_untouched(tmp_path: Path) -> None:
+    site_root = tmp_path / "somethingpositive.net"
+    site_root.mkdir()
+    page = site_root / "index.html"
+    page.write_bytes(b'<a href="sp1.html">1</a>\n<img src="arch/sp1.gif">\n')
+    (site_root / "sp1.html").write_bytes(b"<p>no links</p>\n")
+    before = page.stat()
+    records = [
+        ProvenanceRecord(
+            original_url=f"http://www.somethingpositive.net/{name}",
+            timestamp="20181201120000",
+            source_url="",
+            local_path=f"somethingpositive.net/{name}",
+            sha256="",
+            status="recovered",
+        )
+        for name in ("index.html", "sp1.html")
+    ]
+
+    rewrite_recovered_html_files(
+        tmp_path,
+        records,
+        unresolved_csv_path=tmp_path / "reports" / "unresolved_links.csv",
+    )
+
+    after = page.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert sorted(path.name for path in site_root.iterdir()) == ["index.html", "sp1.html"]
+
+
+def test_rewrite_recovered_html_files_removes_temp_file_on_error(tmp_path: Path) -> None:
+    site_root = tmp_path / "somethingpositive.net"
+    site_root.mkdir()
+    page = site_root / "index.html"
+    page.write_bytes(b'<a href="http://[">broken</a>\n')
+    records = [
+        ProvenanceRecord(
+            original_url="http://www.somethingpositive.net/index.html",
+            timestamp="20181201120000",
+            source_url="",
+            local_path="somethingpositive.net/index.html",
+            sha256="",
+            status="recovered",
+        )
+    ]
+
+    with pytest.raises(ValueError):
+        rewrite_recovered_html_files(
+            tmp_path,
+            records,
+            unresolved_csv_path=tmp_path / "reports" / "unresolved_links.csv",
+        )
+
+    assert page.read_bytes() == b'<a href="http://[">broken</a>\n'
+    assert [path.name for path in site_root.iterdir()] == ["index.html"]